@@ -14,6 +14,38 @@ print_message () {
     echo -e "${left_filler_len// /$symbol}$message${right_filler_len// /$symbol}\033[0m"
 }
 
+# Number of pytest-xdist workers for each project. By default the cores are
+# split between the two projects; 0 runs a project in a single process.
+cores=$(nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null || echo 2)
+workers=${TEST_WORKERS:-$((cores / 2))}
+if (( workers < 2 )); then
+    workers=0
+fi
+
+run_project () {
+    # Run pytest for the project in the directory (first argument) with the
+    # settings module (second argument), writing the output to the log file
+    # (third argument). Each xdist worker gets its own test database, and
+    # loadscope keeps a TestCase class or a module on one worker, so
+    # setUpTestData and module fixtures run once.
+    local xdist_args=(-n "$workers")
+    if (( workers > 0 )); then xdist_args+=(--dist loadscope); fi
+    (
+        cd "$1" &&
+        DJANGO_SETTINGS_MODULE="$2" pytest --tb=line "${xdist_args[@]}"
+    ) > "$3" 2>&1
+}
+
+report_project () {
+    # Print the project log (first argument) and a message (third argument)
+    # if the exit status (second argument) is not zero.
+    cat "$1" 1>&2
+    if [[ "$2" -ne 0 ]]; then
+        print_message "$3" "=" 1
+        echo \`\`\` 1>&2
+    fi
+}
+
 
 if python -m flake8 --config=setup.cfg 1>&2;
 then
@@ -21,28 +53,25 @@ then
     echo $LF 1>&2
     if python structure_test.py
     then
-        cd ya_news
-        export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanews.settings"}"
-        if pytest --tb=line 1>&2;
-        then
-            cd ../ya_note
-            unset DJANGO_SETTINGS_MODULE
-            export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:="yanote.settings"}"
-            if pytest --tb=line 1>&2;
-            then
-                exit 0
-            else
-                status=$?
-                print_message " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта " "=" 1
-                echo \`\`\` 1>&2
-                exit $status
-            fi
-        else
-            status=$?
-            print_message " При запуске упали ваши тесты для проекта YaNews. Проверьте тесты этого проекта " "=" 1
-            echo \`\`\` 1>&2
-            exit $status
+        logs=$(mktemp -d)
+        trap 'rm -rf "$logs"' EXIT
+        run_project ya_news "${DJANGO_SETTINGS_MODULE:-yanews.settings}" \
+            "$logs/ya_news.log" &
+        news_pid=$!
+        run_project ya_note yanote.settings "$logs/ya_note.log" &
+        note_pid=$!
+        wait $news_pid
+        news_status=$?
+        wait $note_pid
+        note_status=$?
+        report_project "$logs/ya_news.log" $news_status \
+            " При запуске упали ваши тесты для проекта YaNews. Проверьте тесты этого проекта "
+        report_project "$logs/ya_note.log" $note_status \
+            " При запуске упали ваши тесты для проекта YaNote. Проверьте тесты этого проекта "
+        if [[ $news_status -ne 0 ]]; then
+            exit $news_status
         fi
+        exit $note_status
     else
         status=$?
         print_message " Убедитесь, что написанные вами тесты скопированы в указанные в ТЗ директории " "=" 1
@@ -5,3 +5,11 @@ class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import backends, query_budget, search, signals  # noqa: F401
+        post_migrate.connect(search.install_triggers, sender=self)
+        connection_created.connect(query_budget.install_recorder)
@@ -0,0 +1,66 @@
+"""
+Асинхронные варианты страниц новостей для запуска под ASGI.
+
+Синхронные view выполняются целиком — запросы к БД и отрисовка
+шаблона — в ограниченном пуле потоков, а не в единственном потоке,
+который ``sync_to_async`` выделяет для thread-sensitive кода. Цикл
+событий при этом свободен для других запросов.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .views import NewsDetailView, NewsList
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.NEWS_ASYNC_THREADS,
+            thread_name_prefix='news-async',
+        )
+    return _executor
+
+
+def _render_in_worker(view, request, *args, **kwargs):
+    """Выполняем view и отрисовываем ответ в потоке пула."""
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        return response
+    finally:
+        # У потоков пула нет request_finished: закрываем соединения сами.
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Запускаем функцию в пуле, передавая ей текущие contextvars."""
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(context.run, func, *args, **kwargs),
+    )
+
+
+def async_view(view):
+    """Оборачиваем синхронную view в корутину, работающую через пул."""
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_pool(
+            _render_in_worker, view, request, *args, **kwargs
+        )
+    # Бюджет запросов берётся из исходного класса.
+    wrapper.view_class = view.view_class
+    return wrapper
+
+
+news_list = async_view(NewsList.as_view())
+news_detail = async_view(NewsDetailView.as_view())
@@ -0,0 +1,78 @@
+"""
+Кеш главной страницы для анонимных пользователей.
+
+Ключ страницы включает отпечаток страницы из БД
+(``conditional.home_fingerprint``), поэтому после изменения новостей
+или комментариев страница собирается заново в любом процессе, даже
+если его кеш общий только для него. Версия ленты в ключе меняется при
+изменениях в этом процессе (см. ``news.signals``) и позволяет сбросить
+все страницы сразу. Старые страницы не удаляются явно, а просто
+перестают запрашиваться и вытесняются по таймауту.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'news:home:version'
+HITS_KEY = 'news:home:hits'
+MISSES_KEY = 'news:home:misses'
+
+
+def get_version():
+    """
+    Текущая версия ленты — время её последнего изменения.
+
+    Если версия вытеснена из кеша, начинаем с текущего времени:
+    так она гарантированно не совпадёт ни с одной из прежних.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Делаем все закешированные страницы ленты неактуальными."""
+    cache.set(VERSION_KEY, time.time(), timeout=None)
+
+
+def page_key(fingerprint):
+    """Ключ страницы ленты для текущей версии и отпечатка страницы."""
+    return f'news:home:page:{get_version()}:{fingerprint}'
+
+
+def get_page(key):
+    """Достаём страницу из кеша, учитывая попадания и промахи."""
+    content = cache.get(key)
+    _increment(MISSES_KEY if content is None else HITS_KEY)
+    return content
+
+
+def set_page(key, content):
+    cache.set(key, content, settings.NEWS_HOME_CACHE_TIMEOUT)
+
+
+def get_stats():
+    """Счётчики попаданий и промахов и доля попаданий."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many((HITS_KEY, MISSES_KEY))
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
@@ -0,0 +1,109 @@
+"""
+Условные GET-запросы: ETag и Last-Modified для ленты и новости.
+
+Значения считаются до загрузки страницы одним запросом к БД: для
+ленты — по id и времени изменения новостей страницы, для новости — по
+времени её изменения. Время изменения новости обновляется и при
+изменении её комментариев. Значения берутся из БД, а не из кеша
+процесса, поэтому одинаковы во всех процессах сайта. Страницы зависят
+от пользователя, поэтому он входит в ETag, а ответы размечаются
+``Vary: Cookie``.
+"""
+from datetime import date
+from hashlib import md5
+
+from django.conf import settings
+
+from .models import News
+from .pagination import before, decode_cursor
+
+
+def make_etag(*parts):
+    return md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def user_part(request):
+    """
+    Часть ETag, зависящая от пользователя.
+
+    CSRF-cookie входит в неё, чтобы после повторного входа не отдать
+    из кеша браузера форму комментария с устаревшим токеном.
+    """
+    if not request.user.is_authenticated:
+        return 'anonymous'
+    return (
+        f'{request.user.pk}:'
+        f'{request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")}'
+    )
+
+
+def home_queryset(cursor=None):
+    """Страница ленты: новости по убыванию (date, id) после курсора."""
+    queryset = News.objects.order_by('-date', '-pk')
+    if cursor:
+        queryset = queryset.filter(
+            before('date', *decode_cursor(cursor, date.fromisoformat))
+        )
+    return queryset[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+
+def home_page_state(request):
+    """
+    Id и время изменения новостей страницы ленты.
+
+    Новые и удалённые новости меняют набор id, а правка новости и её
+    комментариев — время изменения. Запрос идёт по индексу ленты и
+    читает не больше страницы строк.
+    """
+    if not hasattr(request, 'home_page_state'):
+        request.home_page_state = list(
+            home_queryset(request.GET.get('cursor')).values_list(
+                'pk', 'modified'
+            )
+        )
+    return request.home_page_state
+
+
+def home_fingerprint(request):
+    """Отпечаток страницы ленты: по нему же кешируется её HTML."""
+    return make_etag(request.GET.get('cursor', ''), *(
+        f'{pk}:{modified.isoformat()}'
+        for pk, modified in home_page_state(request)
+    ))
+
+
+def home_etag(request, *args, **kwargs):
+    return make_etag(home_fingerprint(request), user_part(request))
+
+
+def home_last_modified(request, *args, **kwargs):
+    """
+    Самое позднее изменение новостей страницы.
+
+    Удаление новости его не сдвигает, но меняет ETag, а браузер
+    проверяет прежде всего ETag.
+    """
+    return max(
+        (modified for _, modified in home_page_state(request)), default=None
+    )
+
+
+def news_modified(request, pk):
+    """Время изменения новости: один запрос по первичному ключу."""
+    if not hasattr(request, 'news_modified'):
+        request.news_modified = News.objects.filter(pk=pk).values_list(
+            'modified', flat=True
+        ).first()
+    return request.news_modified
+
+
+def detail_etag(request, *args, **kwargs):
+    modified = news_modified(request, kwargs['pk'])
+    if modified is None:
+        # Новости нет: пусть view ответит 404.
+        return None
+    return make_etag(kwargs['pk'], modified.isoformat(), user_part(request))
+
+
+def detail_last_modified(request, *args, **kwargs):
+    return news_modified(request, kwargs['pk'])
@@ -1,7 +1,11 @@
+from functools import lru_cache
+
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .moderation import BadWordsMatcher, load_words
 
 BAD_WORDS = (
     'редиска',
@@ -11,6 +15,22 @@ BAD_WORDS = (
 WARNING = 'Не ругайтесь!'
 
 
+@lru_cache(maxsize=None)
+def get_bad_words_matcher():
+    """
+    Автомат для поиска запрещённых слов.
+
+    Строится один раз на процесс из ``BAD_WORDS`` и, если он задан,
+    словаря из файла ``settings.BAD_WORDS_FILE``.
+    """
+    words = list(BAD_WORDS)
+    if settings.BAD_WORDS_FILE:
+        words.extend(load_words(settings.BAD_WORDS_FILE))
+    return BadWordsMatcher(
+        words, normalize_lookalikes=settings.BAD_WORDS_NORMALIZE
+    )
+
+
 class CommentForm(ModelForm):
 
     class Meta:
@@ -20,8 +40,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if get_bad_words_matcher().find(text) is not None:
+            raise ValidationError(WARNING)
         return text
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from news.models import Comment, News
+
+CLIENTS = (1, 16, 128)
+MODES = ('wsgi', 'asgi')
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * share))
+    return ordered[index]
+
+
+def seed(news_count, comments_per_news):
+    author = get_user_model().objects.create(username='bench')
+    News.objects.bulk_create(
+        News(
+            title=f'Новость {i}',
+            text=f'Текст новости {i}',
+            date=timezone.now() - timedelta(days=i),
+        ) for i in range(news_count)
+    )
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {i}')
+        for news in News.objects.all()
+        for i in range(comments_per_news)
+    )
+    News.recount_comments()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает запросы в секунду и p99 страниц новостей под WSGI '
+        'и ASGI при 1, 16 и 128 одновременных клиентах. Приложения '
+        'вызываются в процессе, без HTTP-сервера, на временной БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--news', type=int, default=200)
+        parser.add_argument('--comments', type=int, default=20)
+        parser.add_argument(
+            '--clients', type=int, nargs='+', default=CLIENTS
+        )
+        # Служебные параметры для дочерних процессов.
+        parser.add_argument('--worker', choices=MODES)
+        parser.add_argument('--seed', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed(options['news'], options['comments'])
+        elif options['worker']:
+            self.run_worker(options)
+        else:
+            self.run_all(options)
+
+    def run_all(self, options):
+        manage = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py')]
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, 'YANEWS_DB': str(Path(tmp) / 'bench.db')}
+            subprocess.run([*manage, 'migrate', '-v0'], env=env, check=True)
+            subprocess.run(
+                [*manage, 'bench_asgi', '--seed',
+                 '--news', str(options['news']),
+                 '--comments', str(options['comments'])],
+                env=env, check=True,
+            )
+            self.stdout.write(
+                f'{"режим":>6} {"клиенты":>8} {"запр/с":>9} '
+                f'{"p50, мс":>9} {"p99, мс":>9}'
+            )
+            for mode in MODES:
+                env['NEWS_ASYNC_VIEWS'] = '1' if mode == 'asgi' else '0'
+                for clients in options['clients']:
+                    output = subprocess.run(
+                        [*manage, 'bench_asgi', '--worker', mode,
+                         '--clients', str(clients),
+                         '--requests', str(options['requests']),
+                         '--news', str(options['news'])],
+                        env=env, check=True, capture_output=True, text=True,
+                    ).stdout
+                    result = json.loads(output)
+                    self.stdout.write(
+                        f'{mode:>6} {clients:>8} {result["rps"]:>9.1f} '
+                        f'{result["p50"] * 1000:>9.2f} '
+                        f'{result["p99"] * 1000:>9.2f}'
+                    )
+
+    def run_worker(self, options):
+        ids = list(News.objects.values_list('pk', flat=True))
+        # Главная страница анонимам отдаётся из кеша, поэтому основная
+        # нагрузка — страницы отдельных новостей.
+        paths = ['/'] + [f'/news/{pk}/' for pk in ids]
+        clients = options['clients'][0]
+        total = options['requests']
+        if options['worker'] == 'wsgi':
+            elapsed, latencies = self.drive_wsgi(paths, clients, total)
+        else:
+            elapsed, latencies = asyncio.run(
+                self.drive_asgi(paths, clients, total)
+            )
+        self.stdout.write(json.dumps({
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p99': percentile(latencies, 0.99),
+        }))
+
+    def drive_wsgi(self, paths, clients, total):
+        from django.core.wsgi import get_wsgi_application
+
+        application = get_wsgi_application()
+        counter = iter(range(total))
+        lock = threading.Lock()
+        latencies = []
+
+        def start_response(status, headers, exc_info=None):
+            assert status.startswith('200'), status
+
+        def client():
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                environ = {
+                    'REQUEST_METHOD': 'GET',
+                    'PATH_INFO': paths[number % len(paths)],
+                    'SERVER_NAME': 'localhost',
+                    'SERVER_PORT': '80',
+                    'HTTP_HOST': 'localhost',
+                    'wsgi.url_scheme': 'http',
+                    'wsgi.input': BytesIO(),
+                    'wsgi.errors': sys.stderr,
+                }
+                start = time.perf_counter()
+                response = application(environ, start_response)
+                b''.join(response)
+                response.close()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as executor:
+            futures = [executor.submit(client) for _ in range(clients)]
+        for future in futures:
+            # Ошибка клиента не должна тихо уменьшить число замеров.
+            future.result()
+        return time.perf_counter() - start, latencies
+
+    async def drive_asgi(self, paths, clients, total):
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+        counter = iter(range(total))
+        latencies = []
+
+        async def request(path):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'root_path': '',
+                'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    assert message['status'] == 200, message['status']
+
+            await application(scope, receive, send)
+
+        async def client():
+            for number in counter:
+                start = time.perf_counter()
+                await request(paths[number % len(paths)])
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return time.perf_counter() - start, latencies
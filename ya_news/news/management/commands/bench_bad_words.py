@@ -0,0 +1,58 @@
+import random
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+
+from news.forms import BAD_WORDS
+from news.moderation import BadWordsMatcher
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщъыьэюя'
+
+
+def random_word(rng, min_length=4, max_length=12):
+    length = rng.randint(min_length, max_length)
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def naive_find(words, text):
+    """Прежняя проверка: поиск подстроки отдельно для каждого слова."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает проверку комментария автоматом Ахо — Корасик '
+        'с прежним перебором слов словаря.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=20000)
+        parser.add_argument('--text-length', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = list(BAD_WORDS) + [
+            random_word(rng) for _ in range(options['words'])
+        ]
+        # Чистый текст — худший случай: приходится дочитать до конца.
+        text = ' '.join(
+            random_word(rng, 2, 3) for _ in range(options['text_length'] // 3)
+        )[:options['text_length']]
+        build_time = timeit(lambda: BadWordsMatcher(words), number=1)
+        matcher = BadWordsMatcher(words)
+        repeat = options['repeat']
+        naive_time = timeit(lambda: naive_find(words, text), number=repeat)
+        matcher_time = timeit(lambda: matcher.find(text), number=repeat)
+        self.stdout.write(
+            f'Слов в словаре: {len(words)}, длина текста: {len(text)}\n'
+            f'Построение автомата: {build_time * 1000:.1f} мс\n'
+            f'Перебор слов: {naive_time / repeat * 1000:.3f} мс на текст\n'
+            f'Автомат: {matcher_time / repeat * 1000:.3f} мс на текст\n'
+            f'Ускорение: {naive_time / matcher_time:.1f}x'
+        )
@@ -0,0 +1,120 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news import search
+from news.models import News
+
+ALPHABET = 'абвгдежзиклмнопрстуфхцчшэюя'
+MIN_VOCABULARY = 10
+
+
+class Rollback(Exception):
+    """Откатываем тестовые данные после замеров."""
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def word_groups(vocabulary):
+    """
+    Частые, средние, редкие слова и слова для запросов из двух.
+
+    Границы — доли словаря: при 50 000 слов это первые 10, слова
+    с 100 по 1000, слова начиная с 10 000 и первые 1000.
+    """
+    size = len(vocabulary)
+    middle = size // 500
+    return {
+        'frequent': vocabulary[:max(1, size // 5000)],
+        'middle': vocabulary[middle:max(middle + 1, size // 50)],
+        'rare': vocabulary[size // 5:],
+        'common': vocabulary[:max(2, size // 50)],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку полнотекстового поиска на заданном числе '
+        'новостей. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Поиск работает только на SQLite.')
+        if options['vocabulary'] < MIN_VOCABULARY:
+            raise CommandError(
+                f'В словаре должно быть не меньше {MIN_VOCABULARY} слов.'
+            )
+        rng = random.Random(options['seed'])
+        vocabulary = [
+            ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 10)))
+            for _ in range(options['vocabulary'])
+        ]
+        # Распределение, близкое к закону Ципфа: частые слова в начале.
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(vocabulary))
+        ))
+        try:
+            with transaction.atomic():
+                self.seed(rng, vocabulary, weights, options)
+                self.measure(rng, vocabulary, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rng, vocabulary, weights, options):
+        start = time.perf_counter()
+        count, batch_size = options['count'], options['batch_size']
+
+        def words(k):
+            return ' '.join(rng.choices(vocabulary, cum_weights=weights, k=k))
+
+        for offset in range(0, count, batch_size):
+            News.objects.bulk_create(
+                News(title=words(5), text=words(60))
+                for _ in range(min(batch_size, count - offset))
+            )
+        self.stdout.write(
+            f'Создано новостей: {count} за {time.perf_counter() - start:.1f} с'
+        )
+
+    def measure(self, rng, vocabulary, options):
+        page_size = 20
+        groups = word_groups(vocabulary)
+        cases = {
+            'частое слово': lambda: rng.choice(groups['frequent']),
+            'среднее слово': lambda: rng.choice(groups['middle']),
+            'редкое слово': lambda: rng.choice(groups['rare']),
+            'два слова': lambda: ' '.join(rng.sample(groups['common'], 2)),
+        }
+        for name, make_query in cases.items():
+            timings = []
+            for _ in range(options['queries']):
+                query = make_query()
+                start = time.perf_counter()
+                results = search.search(query, page_size)
+                timings.append(time.perf_counter() - start)
+                if len(results) == page_size:
+                    # Вторая страница по курсору.
+                    last = results[-1]
+                    start = time.perf_counter()
+                    after = (last['score'], last['pk'])
+                    search.search(query, page_size, after)
+                    timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name}: p50 {percentile(timings, 0.5) * 1000:.2f} мс, '
+                f'p95 {percentile(timings, 0.95) * 1000:.2f} мс'
+            )
@@ -0,0 +1,242 @@
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from news import cache
+from news.models import Comment, News
+from news.pagination import encode_cursor
+
+SIZES = (1000, 10_000, 100_000, 1_000_000)
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb')
+# p99 из нескольких десятков замеров — это почти максимум, он слишком
+# шумный, чтобы по нему находить регрессии.
+COMPARED = ('p50_ms', 'p95_ms', 'queries', 'peak_kb')
+# Доля комментариев, которые достаются первой новости: на ней
+# замеряется страница новости с длинным обсуждением.
+HOT_SHARE = 100
+
+# Строки с номерами из [start, stop) одним запросом: в несколько раз
+# быстрее bulk_create, которому нужен объект модели на каждую строку.
+GENERATE_SQL = """
+    INSERT INTO {table} ({columns})
+    WITH RECURSIVE seq(i) AS (
+        SELECT %s UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < %s
+    )
+    SELECT {values} FROM seq
+"""
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def generate(model, start, stop, **values):
+    """
+    Строки ``model`` с номерами от ``start`` до ``stop``.
+
+    Значения полей — выражения SQL от номера строки ``i``.
+    """
+    if start >= stop:
+        return
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in values]
+    sql = GENERATE_SQL.format(
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(column) for column in columns),
+        # Знак % в выражениях — остаток от деления, а не параметр.
+        values=', '.join(
+            value.replace('%', '%%') for value in values.values()
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [start, stop])
+
+
+def compare(report, baseline, tolerance):
+    """Замеры, которые хуже сохранённых больше чем на ``tolerance``."""
+    regressions = []
+    for size, routes in report['results'].items():
+        for route, metrics in routes.items():
+            saved = baseline.get('results', {}).get(size, {}).get(route)
+            if not saved:
+                continue
+            for metric in COMPARED:
+                # Число запросов не должно расти вовсе.
+                limit = saved[metric] if metric == 'queries' else (
+                    saved[metric] * (1 + tolerance)
+                )
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f'{size} {route} {metric}: '
+                        f'{saved[metric]} -> {metrics[metric]}'
+                    )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет, как растут задержка, число запросов и память '
+        'страниц новостей с ростом числа новостей и комментариев. '
+        'Данные создаются во временной БД SQLite. Отчёт пишется в JSON '
+        'и может сравниваться с сохранённым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Куда записать отчёт JSON.')
+        parser.add_argument(
+            '--baseline', help='Отчёт JSON, с которым сравнить замеры.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост задержки и памяти, доля от базовых.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замеры работают только на SQLite.')
+        with tempfile.TemporaryDirectory() as directory:
+            test_settings = connection.settings_dict['TEST']
+            test_settings['NAME'] = str(Path(directory) / 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps(report, ensure_ascii=False, indent=2)
+            )
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(report, baseline, options['tolerance'])
+            for line in regressions:
+                self.stderr.write(f'Регрессия: {line}')
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def run(self, options):
+        author = get_user_model().objects.create(username='bench')
+        report = {
+            'project': 'ya_news',
+            'created': timezone.now().isoformat(),
+            'repeat': options['repeat'],
+            'results': {},
+        }
+        self.stdout.write(
+            f'{"размер":>9} {"страница":<18} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"p99, мс":>9} {"запросов":>9} '
+            f'{"память, КБ":>11}'
+        )
+        size = 0
+        for target in sorted(options['sizes']):
+            self.grow(size, target, author)
+            size = target
+            results = report['results'][str(size)] = {}
+            for route, url in self.cases(size).items():
+                result = results[route] = self.measure(url, options['repeat'])
+                self.stdout.write(
+                    f'{size:>9} {route:<18} {result["p50_ms"]:>9.2f} '
+                    f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                    f'{result["queries"]:>9} {result["peak_kb"]:>11.1f}'
+                )
+        return report
+
+    def grow(self, size, target, author):
+        """Добавляем новости и комментарии, пока их не станет ``target``."""
+        start = time.perf_counter()
+        generate(
+            News, size, target,
+            title="'Новость ' || i",
+            text="'Текст новости ' || i",
+            # По десять новостей на день, от сегодняшнего назад.
+            date="date('now', '-' || (i / 10) || ' days')",
+            comment_count='0',
+            modified="datetime('now')",
+        )
+        first = News.objects.order_by('pk').values_list('pk', flat=True)[0]
+        generate(
+            Comment, size, target,
+            news=(
+                f'CASE WHEN i % {HOT_SHARE} = 0 THEN {first} '
+                f'ELSE {first} + i % {target} END'
+            ),
+            author=str(author.pk),
+            text="'Комментарий ' || i",
+            created="datetime('now', '-' || i || ' seconds')",
+            modified="datetime('now')",
+        )
+        News.recount_comments()
+        self.stdout.write(
+            f'Создано новостей и комментариев: {target} '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
+
+    def cases(self, size):
+        """Адреса для замеров; ключ — имя URL и вариант страницы."""
+        hot = News.objects.order_by('pk')[0]
+        middle = News.objects.order_by('-date', '-pk').values_list(
+            'date', 'pk'
+        )[size // 2]
+        comment = hot.comment_set.order_by('created', 'pk').values_list(
+            'created', 'pk'
+        )[hot.comment_count // 2]
+        home = reverse('news:home')
+        return {
+            'news:home': home,
+            'news:home?cursor': f'{home}?cursor={encode_cursor(*middle)}',
+            'news:detail': reverse('news:detail', args=(hot.pk,)),
+            'news:comments': (
+                reverse('news:comments', args=(hot.pk,))
+                + f'?cursor={encode_cursor(*comment)}'
+            ),
+        }
+
+    def get(self, client, url):
+        # Лента для анонимов кешируется: замеряем её сборку из БД.
+        cache.bump_version()
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+
+    def measure(self, url, repeat):
+        """Задержка, число запросов и пик памяти Python на один запрос."""
+        client = Client(HTTP_HOST='localhost')
+        self.get(client, url)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.get(client, url)
+            timings.append(time.perf_counter() - start)
+        with CaptureQueriesContext(connection) as context:
+            self.get(client, url)
+        # Следующий запрос к сайту очистит журнал, из которого читает
+        # captured_queries.
+        queries = len(context.captured_queries)
+        tracemalloc.start()
+        try:
+            self.get(client, url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'queries': queries,
+            'peak_kb': round(peak / 1024, 1),
+        }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from news import cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кеша главной страницы. '
+        'Имеет смысл для общего для процессов кеша, например файлового.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        stats = cache.get_stats()
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {stats["hit_rate"]:.1%}'
+        )
+        if options['reset']:
+            cache.reset_stats()
@@ -0,0 +1,182 @@
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import reset_queries, router, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from news import cache
+from news.models import Comment, FixtureProgress, News
+
+MODELS = (News, Comment)
+READ_SIZE = 1 << 16
+
+
+class JSONArrayReader:
+    """
+    Читает элементы JSON-массива верхнего уровня по одному.
+
+    В памяти одновременно находится только текущий элемент и один
+    блок файла, поэтому размер фикстуры не важен.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read_more(self):
+        """Дочитываем блок, отбрасывая уже разобранную часть буфера."""
+        chunk = self.stream.read(READ_SIZE)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def next_char(self):
+        """Первый непробельный символ или пустая строка в конце файла."""
+        while True:
+            while (
+                self.position < len(self.buffer)
+                and self.buffer[self.position].isspace()
+            ):
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.read_more()
+
+    def __iter__(self):
+        if self.next_char() != '[':
+            raise ValueError('Фикстура должна быть JSON-массивом.')
+        self.position += 1
+        while True:
+            char = self.next_char()
+            if not char:
+                raise ValueError('Файл закончился до конца JSON-массива.')
+            if char == ']':
+                return
+            if char == ',':
+                self.position += 1
+                continue
+            yield self.decode_item()
+
+    def decode_item(self):
+        while True:
+            try:
+                item, self.position = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+                return item
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.read_more()
+
+
+class RawInsertQuerySet(QuerySet):
+    """
+    ``bulk_create``, который записывает значения полей как есть.
+
+    Так сохраняет записи и loaddata: ``auto_now`` и ``auto_now_add``
+    не заменяют даты из фикстуры текущим временем.
+    """
+
+    def _insert(self, *args, **kwargs):
+        kwargs['raw'] = True
+        return super()._insert(*args, **kwargs)
+
+
+def timestamp_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает фикстуру news.News и news.Comment в формате '
+        'loaddata пачками через bulk_create. После сбоя загрузку можно '
+        'продолжить с последней сохранённой пачки ключом --resume: '
+        'число загруженных записей хранится в БД в одной транзакции '
+        'с самой пачкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Пропустить записи, загруженные до сбоя.',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        self.source = str(path.resolve())
+        # Прогресс читаем из основной БД, даже если есть реплики.
+        progress = FixtureProgress.objects.using(
+            router.db_for_write(FixtureProgress)
+        ).filter(source=self.source)
+        skip = 0
+        if options['resume']:
+            skip = progress.values_list('records', flat=True).first() or 0
+            self.stdout.write(f'Пропускаем {skip} загруженных записей.')
+        loaded = skip
+        start = time.perf_counter()
+        with open(path, encoding='utf-8') as stream:
+            records = islice(JSONArrayReader(stream), skip, None)
+            try:
+                objects = Deserializer(records, ignorenonexistent=True)
+                while True:
+                    batch = list(islice(objects, options['batch_size']))
+                    if not batch:
+                        break
+                    self.save_batch(batch, loaded + len(batch))
+                    loaded += len(batch)
+            except (ValueError, DeserializationError) as error:
+                raise CommandError(
+                    f'Ошибка в записи {loaded + 1}: {error}. Загруженное '
+                    f'сохранено, продолжите с ключом --resume.'
+                )
+        progress.delete()
+        cache.bump_version()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {loaded - skip} за {elapsed:.1f} с '
+            f'({(loaded - skip) / elapsed:.0f} записей/с)'
+        ))
+
+    def save_batch(self, batch, loaded):
+        by_model = {model: [] for model in MODELS}
+        now = timezone.now()
+        for deserialized in batch:
+            obj = deserialized.object
+            if type(obj) not in by_model:
+                raise CommandError(
+                    f'Модель {obj._meta.label} не поддерживается.'
+                )
+            # Даты, которых нет в фикстуре, ставим сами: вставка их
+            # не заполняет.
+            for field in timestamp_fields(type(obj)):
+                if getattr(obj, field.attname) is None:
+                    setattr(obj, field.attname, now)
+            by_model[type(obj)].append(obj)
+        with transaction.atomic():
+            for model, objs in by_model.items():
+                RawInsertQuerySet(model).bulk_create(objs)
+            commented = {comment.news_id for comment in by_model[Comment]}
+            if commented:
+                News.recount_comments(commented)
+            FixtureProgress.objects.update_or_create(
+                source=self.source, defaults={'records': loaded}
+            )
+        # При DEBUG=True Django копит SQL всех запросов, а он здесь большой.
+        reset_queries()
@@ -0,0 +1,105 @@
+import pstats
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news import profiling
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def function_name(key):
+    filename, line, name = key
+    return f'{filename}:{line}({name})'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка сохранённых профилей запросов по имени URL: время '
+        'запроса, SQL и шаблонов, самые горячие функции и SQL-запросы. '
+        'С --token печатает значение заголовка, по которому запрос '
+        'будет профилирован.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--url-name', help='Только профили этого URL, например '
+            'news:detail.'
+        )
+        parser.add_argument('--dir', default=settings.PROFILING_DIR)
+        parser.add_argument('--token', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token())
+            return
+        groups = defaultdict(list)
+        for meta, path in profiling.load(options['dir']):
+            url_name = meta['url_name'] or '-'
+            if options['url_name'] in (None, url_name):
+                groups[url_name].append((meta, path))
+        if not groups:
+            self.stdout.write('Профилей нет.')
+            return
+        # Первыми — URL, на которые ушло больше всего времени.
+        for url_name, profiles in sorted(
+            groups.items(),
+            key=lambda item: sum(meta['duration'] for meta, _ in item[1]),
+            reverse=True,
+        ):
+            self.report(url_name, profiles, options['top'])
+
+    def report(self, url_name, profiles, top):
+        count = len(profiles)
+        durations = [meta['duration'] for meta, _ in profiles]
+        sql_time = sum(
+            seconds for meta, _ in profiles for _, seconds in meta['queries']
+        )
+        template_time = sum(meta['template_time'] for meta, _ in profiles)
+        self.stdout.write(
+            f'\n{url_name}: профилей {count}, '
+            f'p50 {statistics.median(durations) * 1000:.1f} мс, '
+            f'p95 {percentile(durations, 0.95) * 1000:.1f} мс, '
+            f'SQL {sql_time / count * 1000:.1f} мс, '
+            f'шаблоны {template_time / count * 1000:.1f} мс на запрос'
+        )
+        self.write_functions(profiles, top)
+        self.write_queries(profiles, top)
+
+    def write_functions(self, profiles, top):
+        """Функции с наибольшим собственным временем."""
+        count = len(profiles)
+        stats = pstats.Stats(*(str(path) for _, path in profiles)).stats
+        self.stdout.write(
+            f'{"своё, мс":>10} {"всего, мс":>10} {"вызовов":>9}  функция'
+        )
+        for key, (_, calls, own, total, _) in sorted(
+            stats.items(), key=lambda item: item[1][2], reverse=True
+        )[:top]:
+            self.stdout.write(
+                f'{own / count * 1000:>10.2f} {total / count * 1000:>10.2f} '
+                f'{calls / count:>9.1f}  {function_name(key)}'
+            )
+
+    def write_queries(self, profiles, top):
+        """SQL-запросы с наибольшим суммарным временем."""
+        count = len(profiles)
+        queries = defaultdict(lambda: [0, 0.0])
+        for meta, _ in profiles:
+            for sql, seconds in meta['queries']:
+                queries[sql][0] += 1
+                queries[sql][1] += seconds
+        self.stdout.write(f'{"время, мс":>10} {"запросов":>10}  SQL')
+        for sql, (calls, seconds) in sorted(
+            queries.items(), key=lambda item: item[1][1], reverse=True
+        )[:top]:
+            self.stdout.write(
+                f'{seconds / count * 1000:>10.2f} {calls / count:>10.1f}  '
+                f'{" ".join(sql.split())}'
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from news import cache
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчик комментариев у новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'news_ids',
+            nargs='*',
+            type=int,
+            help='id новостей; по умолчанию пересчитываются все.',
+        )
+
+    def handle(self, *args, **options):
+        updated = News.recount_comments(options['news_ids'] or None)
+        cache.bump_version()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано новостей: {updated}')
+        )
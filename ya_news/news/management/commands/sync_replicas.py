@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from news.replicas import sync_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную БД в реплики для чтения. С --interval '
+        'повторяет копирование каждые столько секунд, пока не будет '
+        'остановлена; интервал не должен превышать REPLICA_PIN_SECONDS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float)
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            sync_replicas()
+            self.stdout.write(self.style.SUCCESS(
+                f'Обновлено реплик: {len(settings.NEWS_READ_REPLICAS)}'
+            ))
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:21
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    Comment = apps.get_model('news', 'Comment')
+    comments = Comment.objects.filter(
+        news=models.OuterRef('pk')
+    ).order_by().values('news').annotate(
+        total=models.Count('pk')
+    ).values('total')
+    News.objects.update(
+        comment_count=Coalesce(models.Subquery(comments), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FixtureProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('records', models.PositiveIntegerField(verbose_name='Загружено записей')),
+            ],
+            options={
+                'verbose_name': 'Прогресс загрузки фикстуры',
+                'verbose_name_plural': 'Прогресс загрузки фикстур',
+            },
+        ),
+    ]
@@ -1,27 +1,97 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import cache
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    # Меняется и при изменении комментариев: служит для ETag страницы.
+    modified = models.DateTimeField('Изменена', auto_now=True)
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('date', 'id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def recount_comments(cls, news_ids=None):
+        """
+        Пересчитываем денормализованный счётчик комментариев.
+
+        Если ``news_ids`` не передан, пересчитываются все новости.
+        """
+        comments = Comment.objects.filter(
+            news=models.OuterRef('pk')
+        ).order_by().values('news').annotate(
+            total=models.Count('pk')
+        ).values('total')
+        queryset = cls.objects.all()
+        if news_ids is not None:
+            queryset = queryset.filter(pk__in=news_ids)
+        return queryset.update(
+            comment_count=Coalesce(
+                models.Subquery(comments), 0
+            )
+        )
+
+    @classmethod
+    def comments_removed(cls, news_ids):
+        """
+        Обновляем новости, чьи комментарии удалены без ``Comment.delete``.
+
+        Пересчитываем счётчики, отмечаем изменение новостей и сбрасываем
+        кеш ленты.
+        """
+        cls.recount_comments(news_ids)
+        cls.objects.filter(pk__in=news_ids).update(modified=timezone.now())
+        cache.bump_version()
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def delete(self):
+        """
+        Удаляем комментарии одним запросом и пересчитываем счётчики.
+
+        Без этого ``Comment.objects.filter(...).delete()`` и массовое
+        удаление в админке оставляли бы ``News.comment_count``
+        устаревшим. Каскадное удаление идёт мимо этого метода.
+        """
+        with transaction.atomic(using=self.db):
+            news_ids = list(
+                self.order_by().values_list('news_id', flat=True).distinct()
+            )
+            result = super().delete()
+            if news_ids:
+                News.comments_removed(news_ids)
+        return result
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Отдельный индекс не нужен: его заменяет составной из Meta.
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -29,9 +99,46 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def delete(self, *args, **kwargs):
+        """
+        Удаляем комментарий и уменьшаем счётчик его новости.
+
+        Счётчик меняется здесь, а не в обработчике post_delete: такой
+        обработчик запрещает Django быстрое каскадное удаление, и
+        удаление новости загружало бы все её комментарии по одному.
+        """
+        result = super().delete(*args, **kwargs)
+        News.objects.filter(pk=self.news_id).update(
+            comment_count=Greatest(F('comment_count') - 1, 0),
+            modified=timezone.now(),
+        )
+        cache.bump_version()
+        return result
+
+
+class FixtureProgress(models.Model):
+    """Сколько записей фикстуры уже загружено командой load_news_fixture."""
+    source = models.CharField('Файл', max_length=255, unique=True)
+    records = models.PositiveIntegerField('Загружено записей')
+
+    class Meta:
+        verbose_name = 'Прогресс загрузки фикстуры'
+        verbose_name_plural = 'Прогресс загрузки фикстур'
+
+    def __str__(self):
+        return f'{self.source}: {self.records}'
@@ -0,0 +1,101 @@
+"""
+Поиск запрещённых слов в тексте за один проход.
+
+Автомат Ахо — Корасик строится один раз по словарю, после чего проверка
+текста занимает время, линейное по его длине, независимо от размера
+словаря.
+"""
+
+# Латинские буквы и цифры, которыми подменяют похожие кириллические.
+LOOKALIKES = str.maketrans({
+    'a': 'а',
+    'b': 'в',
+    'c': 'с',
+    'e': 'е',
+    'h': 'н',
+    'k': 'к',
+    'm': 'м',
+    'o': 'о',
+    'p': 'р',
+    't': 'т',
+    'x': 'х',
+    'y': 'у',
+    '0': 'о',
+    '3': 'з',
+    '6': 'б',
+    'ё': 'е',
+})
+
+
+def normalize(text):
+    """Приводим текст к нижнему регистру и заменяем «двойников» букв."""
+    return text.lower().translate(LOOKALIKES)
+
+
+def load_words(path):
+    """Читаем словарь: по слову в строке, строки с ``#`` пропускаются."""
+    with open(path, encoding='utf-8') as words_file:
+        for line in words_file:
+            word = line.strip()
+            if word and not word.startswith('#'):
+                yield word
+
+
+class BadWordsMatcher:
+    """Автомат Ахо — Корасик для поиска любого слова из словаря."""
+
+    def __init__(self, words, normalize_lookalikes=True):
+        self.normalize_lookalikes = normalize_lookalikes
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]
+        for word in words:
+            self._add(word)
+        self._build_failure_links()
+
+    def _prepare(self, text):
+        if self.normalize_lookalikes:
+            return normalize(text)
+        return text.lower()
+
+    def _add(self, word):
+        prepared = self._prepare(word)
+        if not prepared:
+            return
+        node = 0
+        for char in prepared:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._goto[node][char] = child
+            node = child
+        if self._output[node] is None:
+            self._output[node] = word
+
+    def _build_failure_links(self):
+        """Обход в ширину: ссылка неудачи ведёт на длиннейший суффикс."""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+
+    def find(self, text):
+        """Возвращаем первое найденное слово словаря или ``None``."""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in self._prepare(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] is not None:
+                return output[node]
+        return None
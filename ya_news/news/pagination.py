@@ -0,0 +1,58 @@
+"""Курсорная (keyset) пагинация по паре «позиция + id»."""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.http import Http404
+
+SEPARATOR = '|'
+
+
+def encode_cursor(position, pk):
+    """
+    Упаковываем позицию записи в непрозрачный токен.
+
+    Даты записываются в ISO-формате, числа — через ``repr``, который
+    для float восстанавливается без потери точности.
+    """
+    if hasattr(position, 'isoformat'):
+        position = position.isoformat()
+    else:
+        position = repr(position)
+    raw = f'{position}{SEPARATOR}{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, parse_position):
+    """
+    Распаковываем токен в пару (позиция, id).
+
+    ``parse_position`` превращает строку обратно в значение поля,
+    например ``date.fromisoformat``. Испорченный токен даёт 404.
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = urlsafe_b64decode(token + padding).decode()
+        position, pk = raw.rsplit(SEPARATOR, 1)
+        return parse_position(position), int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise Http404('Некорректный курсор.')
+
+
+def before(field, position, pk):
+    """
+    Условие «строго раньше (position, pk)» для сортировки по убыванию.
+
+    Оформлено как диапазон по ``field`` плюс уточнение для строк
+    с той же позицией, чтобы БД могла идти по составному индексу.
+    """
+    return Q(**{f'{field}__lte': position}) & (
+        Q(**{f'{field}__lt': position}) | Q(pk__lt=pk)
+    )
+
+
+def after(field, position, pk):
+    """Условие «строго позже (position, pk)» для сортировки по возрастанию."""
+    return Q(**{f'{field}__gte': position}) & (
+        Q(**{f'{field}__gt': position}) | Q(pk__gt=pk)
+    )
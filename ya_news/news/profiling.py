@@ -0,0 +1,165 @@
+"""
+Профилирование отдельных запросов к сайту.
+
+``ProfilingMiddleware`` работает, только если включена настройка
+``PROFILING_ENABLED``. Профилируется запрос с подписанным заголовком
+``PROFILING_HEADER`` (значение выдаёт ``make_token`` или команда
+``profile_report --token``) и случайная доля ``PROFILING_SAMPLE_RATE``
+остальных запросов. Подпись не даёт посторонним включать
+профилирование, которое замедляет запрос в несколько раз.
+
+Для профилируемого запроса сохраняются профиль cProfile, время каждого
+SQL-запроса и время отрисовки шаблонов: по паре файлов в
+``PROFILING_DIR``, из которых хранятся последние
+``PROFILING_MAX_FILES``. Сводку по имени URL печатает команда
+``profile_report``.
+"""
+import asyncio
+import cProfile
+import json
+import os
+import random
+import time
+from contextlib import ExitStack
+from itertools import count
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.template.base import Template
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+
+SALT = 'news.profiling'
+TOKEN_VALUE = 'profile'
+
+# Время отрисовки шаблонов — накопленное время Template.render
+# в профиле. Вложенные шаблоны cProfile повторно не считает.
+_render = Template.render.__code__
+TEMPLATE_RENDER = (
+    _render.co_filename, _render.co_firstlineno, _render.co_name
+)
+
+_numbers = count()
+
+
+def make_token():
+    """Значение заголовка, по которому запрос будет профилирован."""
+    return signing.TimestampSigner(salt=SALT).sign(TOKEN_VALUE)
+
+
+def has_token(request):
+    value = request.headers.get(settings.PROFILING_HEADER)
+    if not value:
+        return False
+    try:
+        return signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        ) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+def should_profile(request):
+    if not settings.PROFILING_ENABLED:
+        return False
+    return has_token(request) or (
+        random.random() < settings.PROFILING_SAMPLE_RATE
+    )
+
+
+class QueryTimer:
+    """Обёртка ``execute_wrapper``: SQL и время каждого запроса."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+
+def save(meta, profiler):
+    """Записываем профиль и удаляем самые старые сверх лимита."""
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Имя начинается со времени, поэтому порядок имён — порядок записи.
+    stem = f'{time.time_ns()}-{os.getpid()}-{next(_numbers)}'
+    profiler.dump_stats(directory / f'{stem}.prof')
+    # Описание пишется вторым: по нему профиль ищет profile_report.
+    (directory / f'{stem}.json').write_text(
+        json.dumps(meta, ensure_ascii=False)
+    )
+    stems = sorted(path.stem for path in directory.glob('*.json'))
+    for old in stems[:max(0, len(stems) - settings.PROFILING_MAX_FILES)]:
+        for suffix in ('.json', '.prof'):
+            (directory / f'{old}{suffix}').unlink(missing_ok=True)
+
+
+def load(directory):
+    """Сохранённые профили: пары (описание, путь к файлу cProfile)."""
+    for path in sorted(Path(directory).glob('*.json')):
+        stats_path = path.with_suffix('.prof')
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Удалён ротацией или ещё не дописан.
+            continue
+        if stats_path.exists():
+            yield meta, stats_path
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Профилирует выбранные запросы, остальные пропускает как есть.
+
+    Стоит первым в ``MIDDLEWARE``, чтобы в профиль попали и остальные
+    middleware. Тело потокового ответа создаётся уже после middleware
+    и в профиль не попадает.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not should_profile(request):
+            return self.get_response(request)
+        return self.profile(request)
+
+    async def __acall__(self, request):
+        # cProfile видит только свой поток, а под ASGI запрос
+        # выполняется в цикле событий и пулах потоков.
+        return await self.get_response(request)
+
+    def profile(self, request):
+        timer = QueryTimer()
+        profiler = cProfile.Profile()
+        started = timezone.now()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+        profiler.create_stats()
+        match = request.resolver_match
+        save({
+            'url_name': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'started': started.isoformat(),
+            'duration': duration,
+            'template_time': profiler.stats.get(
+                TEMPLATE_RENDER, (0, 0, 0, 0)
+            )[3],
+            'queries': timer.queries,
+        }, profiler)
+        return response
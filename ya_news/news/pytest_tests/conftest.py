@@ -3,18 +3,147 @@ from datetime import timedelta
 import pytest
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.test.client import Client
 from django.urls import reverse
 from django.utils import timezone
 
 from news.models import Comment, News
 
+LIST_COMMENTS_COUNT = 5
+
+
+def login(user):
+    """Ключ сессии пользователя, как после входа на сайт."""
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def seeded(model, pk):
+    """Объект из общих данных; читаем из основной БД, даже с репликой."""
+    return model.objects.using(DEFAULT_DB_ALIAS).get(pk=pk)
+
+
+def logged_in_client(session_key):
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    return client
+
+
+def seed_database():
+    """
+    Общие данные тестов: пользователи с готовыми сессиями, новости
+    и комментарии.
+
+    Новость ``news`` создаётся последней, чтобы ``news.id + 1`` не
+    принадлежал ни одной новости.
+    """
+    user_model = get_user_model()
+    author = user_model.objects.create(username='Автор')
+    not_author = user_model.objects.create(username='Не автор')
+    # Без пароля, чтобы не тратить время на хеширование.
+    admin = user_model.objects.create_superuser(
+        username='admin', email='admin@example.com', password=None
+    )
+    News.objects.bulk_create(
+        News(
+            title=f'Заголовок {i}',
+            text=f'Текст новости {i}',
+            date=timezone.now() - timedelta(days=i)
+        ) for i in range(settings.NEWS_COUNT_ON_HOME_PAGE + 1)
+    )
+    news = News.objects.create(title='Заголовок', text='Текст новости',)
+    comment = Comment.objects.create(
+        news=news,
+        author=author,
+        text='Текст комментария',
+    )
+    for i in range(LIST_COMMENTS_COUNT):
+        Comment.objects.create(
+            news=news,
+            author=author,
+            text=f'Текст комментария {i}'
+        )
+    return {
+        'author': author.pk,
+        'not_author': not_author.pk,
+        'admin': admin.pk,
+        'news': news.pk,
+        'comment': comment.pk,
+        'sessions': {
+            'author': login(author),
+            'not_author': login(not_author),
+            'admin': login(admin),
+        },
+    }
+
+
+@pytest.fixture(scope='session')
+def seed():
+    """Первичные ключи и сессии общих данных из ``seed_database``."""
+    return {}
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, seed):
+    """
+    Общие данные создаются один раз за сессию (в каждом процессе
+    pytest-xdist), а каждый тест видит их внутри своей транзакции,
+    которая откатывается после теста.
+    """
+    with django_db_blocker.unblock():
+        seed.update(seed_database())
+
+
+@pytest.fixture
+def restore_seed(django_db_setup, django_db_blocker, seed):
+    """Транзакционные тесты очищают БД: возвращаем общие данные."""
+    with django_db_blocker.unblock():
+        if not News.objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=seed['news']
+        ).exists():
+            seed.update(seed_database())
+
 
 @pytest.fixture(autouse=True)
-def enable_db_access_for_all_tests(db):
+def enable_db_access_for_all_tests(restore_seed, db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(settings):
+    settings.QUERY_BUDGET_STRICT = True
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    """Без реплик, даже если они заданы через YANEWS_REPLICAS."""
+    settings.NEWS_READ_REPLICAS = ()
+
+
+@pytest.fixture
+def replica(tmp_path, settings):
+    """Реплика в отдельном файле SQLite."""
+    alias = 'replica_test'
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    settings.NEWS_READ_REPLICAS = (alias,)
+    yield alias
+    connections[alias].close()
+    delattr(connections._connections, alias)
+    del connections.databases[alias]
+
+
 @pytest.fixture
 def home_url():
     return reverse('news:home')
@@ -40,6 +169,11 @@ def detail_url(news):
     return reverse('news:detail', args=(news.id,))
 
 
+@pytest.fixture
+def comments_url(news):
+    return reverse('news:comments', args=(news.id,))
+
+
 @pytest.fixture
 def edit_comment_url(comment):
     return reverse('news:edit', args=(comment.id,))
@@ -51,64 +185,55 @@ def delete_comment_url(comment):
 
 
 @pytest.fixture
-def author(django_user_model):
-    return django_user_model.objects.create(username='Автор')
+def author(django_user_model, seed):
+    return seeded(django_user_model, seed['author'])
 
 
 @pytest.fixture
-def not_author(django_user_model):
-    return django_user_model.objects.create(username='Не автор')
+def not_author(django_user_model, seed):
+    return seeded(django_user_model, seed['not_author'])
 
 
 @pytest.fixture
-def author_client(author):
-    client = Client()
-    client.force_login(author)
-    return client
+def admin_user(django_user_model, seed):
+    return seeded(django_user_model, seed['admin'])
 
 
 @pytest.fixture
-def not_author_client(not_author):
-    client = Client()
-    client.force_login(not_author)
-    return client
+def author_client(seed):
+    return logged_in_client(seed['sessions']['author'])
 
 
 @pytest.fixture
-def news():
-    return News.objects.create(title='Заголовок', text='Текст новости',)
+def not_author_client(seed):
+    return logged_in_client(seed['sessions']['not_author'])
 
 
 @pytest.fixture
-def comment(author, news):
-    return Comment.objects.create(
-        news=news,
-        author=author,
-        text='Текст комментария',
-    )
+def admin_client(seed):
+    return logged_in_client(seed['sessions']['admin'])
 
 
 @pytest.fixture
-def list_news():
-    news_count = settings.NEWS_COUNT_ON_HOME_PAGE + 1
-    news_list = [
-        News(
-            title=f'Заголовок {i}',
-            text=f'Текст новости {i}',
-            date=timezone.now() - timedelta(days=i)
-        ) for i in range(news_count)
-    ]
-    News.objects.bulk_create(news_list)
+def news(seed):
+    return seeded(News, seed['news'])
 
 
 @pytest.fixture
-def list_comments(author, news):
-    for i in range(5):
-        Comment.objects.create(
-            news=news,
-            author=author,
-            text=f'Текст комментария {i}'
-        )
+def comment(seed):
+    return seeded(Comment, seed['comment'])
+
+
+@pytest.fixture
+def list_news(seed):
+    """Новостей на одну больше, чем помещается на главной."""
+    return News.objects.using(DEFAULT_DB_ALIAS).exclude(pk=seed['news'])
+
+
+@pytest.fixture
+def list_comments(news, comment):
+    """Ещё LIST_COMMENTS_COUNT комментариев автора к новости."""
+    return news.comment_set.exclude(pk=comment.pk)
 
 
 @pytest.fixture
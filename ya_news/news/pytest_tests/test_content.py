@@ -1,7 +1,21 @@
+import logging
+from http import HTTPStatus
+
+import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache as django_cache
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from news import async_views, cache
 from news.forms import CommentForm
-from news.models import News
+from news.models import Comment, News
+from news.query_budget import QueryBudgetExceeded, get_url_stats
+from news.views import NewsCommentList, NewsList
 
 
 def test_news_count(client, list_news, home_url):
@@ -24,6 +38,231 @@ def test_news_order(client, list_news, home_url):
     assert list(object_list) == list(all_news)
 
 
+def test_news_cursor_pagination(client, list_news, home_url):
+    """По курсору «Более старые новости» доступны все новости,
+    без повторов и в порядке от свежих к старым.
+    """
+    seen = []
+    url = home_url
+    while url:
+        response = client.get(url)
+        seen.extend(response.context['object_list'])
+        cursor = response.context.get('next_cursor')
+        url = f'{home_url}?cursor={cursor}' if cursor else None
+    assert seen == list(News.objects.order_by('-date', '-pk'))
+
+
+def test_news_invalid_cursor(client, home_url):
+    """Испорченный курсор приводит к 404."""
+    response = client.get(f'{home_url}?cursor=broken')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_home_page_single_query(client, list_news, home_url,
+                                django_assert_num_queries):
+    """Главная страница загружается запросом отпечатка страницы
+    и запросом новостей, без комментариев.
+    """
+    with django_assert_num_queries(2):
+        client.get(home_url)
+
+
+def test_home_page_cached_for_anonymous(client, list_news, home_url,
+                                        django_assert_num_queries):
+    """Повторный запрос главной страницы обслуживается из кеша,
+    с одним запросом отпечатка страницы.
+    """
+    first = client.get(home_url)
+    with django_assert_num_queries(1):
+        second = client.get(home_url)
+    assert second.content == first.content
+    assert cache.get_stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_home_page_cache_invalidated(client, author, news, home_url):
+    """Новый комментарий сбрасывает кеш главной страницы."""
+    client.get(home_url)
+    Comment.objects.create(news=news, author=author, text='Комментарий')
+    response = client.get(home_url)
+    assert (
+        f'Комментариев: {news.comment_count + 1}'
+        in response.content.decode()
+    )
+
+
+def test_home_page_not_modified(client, list_news, home_url, author, news,
+                                django_assert_num_queries):
+    """Актуальная копия ленты подтверждается ответом 304 после одного
+    запроса к БД, а после изменений отдаётся новая страница.
+    """
+    etag = client.get(home_url)['ETag']
+    with django_assert_num_queries(1):
+        response = client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    Comment.objects.create(news=news, author=author, text='Комментарий')
+    response = client.get(home_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_home_page_validators_shared_by_processes(
+    client, author, news, home_url
+):
+    """ETag, Last-Modified и кеш ленты зависят от данных в БД, а не от
+    версии ленты в кеше процесса: процесс, не заметивший изменения,
+    не отдаёт старую страницу.
+    """
+    first = client.get(home_url)
+    version = cache.get_version()
+    Comment.objects.create(news=news, author=author, text='Комментарий')
+    # Изменение обработал другой процесс: версия здесь прежняя.
+    django_cache.set(cache.VERSION_KEY, version, timeout=None)
+    response = client.get(home_url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == HTTPStatus.OK
+    assert response['ETag'] != first['ETag']
+    assert (
+        f'Комментариев: {news.comment_count + 1}'
+        in response.content.decode()
+    )
+
+
+def test_detail_page_not_modified(author_client, client, author, news,
+                                  detail_url, django_assert_num_queries):
+    """Страница новости не отрисовывается заново, пока не изменились
+    ни новость, ни её комментарии; ETag зависит от пользователя.
+    """
+    etag = client.get(detail_url)['ETag']
+    with django_assert_num_queries(1):
+        response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.templates
+    response = author_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    comment = Comment.objects.create(news=news, author=author, text='Текст')
+    etag = client.get(detail_url)['ETag']
+    comment.text = 'Исправленный текст'
+    comment.save()
+    response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_no_auth_queries_when_warm(author_client, home_url):
+    """Прогретый запрос авторизованного пользователя не читает
+    сессию и пользователя из БД.
+    """
+    author_client.get(home_url)
+    with CaptureQueriesContext(connection) as context:
+        author_client.get(home_url)
+    tables = ('auth_user', 'django_session')
+    assert not [
+        query['sql'] for query in context.captured_queries
+        if any(table in query['sql'] for table in tables)
+    ]
+
+
+def test_user_cache_invalidated_on_save(author_client, author, home_url):
+    """Изменения пользователя сразу видны на страницах."""
+    author_client.get(home_url)
+    author.username = 'Переименованный'
+    author.save()
+    assert 'Переименованный' in author_client.get(home_url).content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views(news, list_news, home_url, detail_url):
+    """Асинхронные варианты страниц отдают то же содержимое,
+    выполняя запросы к БД в пуле потоков.
+    """
+    factory = AsyncRequestFactory()
+    for view, url, kwargs in (
+        (async_views.news_list, home_url, {}),
+        (async_views.news_detail, detail_url, {'pk': news.pk}),
+    ):
+        request = factory.get(url)
+        request.user = AnonymousUser()
+        response = async_to_sync(view)(request, **kwargs)
+        assert response.status_code == HTTPStatus.OK
+        assert news.title in response.content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_query_budget_under_asgi(async_client, news, list_comments,
+                                 comments_url, monkeypatch):
+    """Под ASGI запросы синхронных view тоже учитываются в бюджете."""
+    async def get_comments():
+        return await async_client.get(comments_url)
+
+    async_to_sync(get_comments)()
+    assert get_url_stats()['news:comments']['queries'] > 0
+    monkeypatch.setattr(NewsCommentList, 'query_budget', 0)
+    with pytest.raises(QueryBudgetExceeded):
+        async_to_sync(get_comments)()
+
+
+def search_results(client, query, cursor=None):
+    params = {'q': query}
+    if cursor:
+        params['cursor'] = cursor
+    response = client.get(reverse('news:search'), params)
+    return response.context['results'], response.context.get('next_cursor')
+
+
+def test_search_ranked_and_highlighted(client, news):
+    """Совпадение в заголовке ранжируется выше совпадения в тексте,
+    найденные слова подсвечиваются, а HTML экранируется.
+    """
+    in_text = News.objects.create(title='Другое', text='<b>Комета</b> рядом')
+    in_title = News.objects.create(title='Комета', text='Текст')
+    results, _ = search_results(client, 'комета')
+    assert [result['pk'] for result in results] == [in_title.pk, in_text.pk]
+    assert results[0]['title'] == '<mark>Комета</mark>'
+    assert '&lt;b&gt;<mark>Комета</mark>&lt;/b&gt;' in results[1]['snippet']
+
+
+def test_search_follows_changes(client, news):
+    """Индекс поиска обновляется при изменении и удалении новости."""
+    def found(query):
+        return [result['pk'] for result in search_results(client, query)[0]]
+
+    assert news.pk in found('Заголовок')
+    news.title = 'Переименовано'
+    news.save()
+    assert news.pk not in found('Заголовок')
+    assert found('Переименовано') == [news.pk]
+    news.delete()
+    assert not found('Переименовано')
+
+
+def test_search_cursor_pagination(client, settings, list_news):
+    """Все результаты поиска доступны постранично по курсору."""
+    settings.NEWS_SEARCH_PAGE_SIZE = 4
+    found = []
+    cursor = None
+    while True:
+        results, cursor = search_results(client, 'новости', cursor)
+        found.extend(result['pk'] for result in results)
+        if not cursor:
+            break
+    assert sorted(found) == sorted(News.objects.values_list('pk', flat=True))
+
+
+def test_query_budget_enforced(client, list_news, home_url, monkeypatch):
+    """Превышение бюджета запросов view в тестах приводит к ошибке."""
+    monkeypatch.setattr(NewsList, 'query_budget', 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(home_url)
+
+
+def test_query_stats_collected(client, list_news, home_url, settings,
+                               caplog):
+    """Число запросов к БД накапливается по имени URL и пишется в лог."""
+    settings.QUERY_STATS_LOG_EVERY = 1
+    before = get_url_stats().get('news:home', {}).get('queries', 0)
+    with caplog.at_level(logging.INFO, logger='news.query_budget'):
+        client.get(home_url)
+    assert get_url_stats()['news:home']['queries'] == before + 2
+    assert any('news:home' in message for message in caplog.messages)
+
+
 def test_comments_order(client, news, list_comments, detail_url):
     """Комментарии на странице отдельной новости отсортированы в
     хронологическом порядке.
@@ -35,6 +274,24 @@ def test_comments_order(client, news, list_comments, detail_url):
     assert list(news.comment_set.all()) == all_comments
 
 
+def test_comments_paginated(client, settings, news, list_comments,
+                            detail_url):
+    """Страница новости выводит только первые комментарии,
+    остальные подгружаются по курсору отдельным фрагментом.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    response = client.get(detail_url)
+    seen = list(response.context['comments'])
+    assert len(seen) == 2
+    cursor = response.context['next_cursor']
+    comments_url = reverse('news:comments', args=(news.id,))
+    while cursor:
+        response = client.get(f'{comments_url}?cursor={cursor}')
+        seen.extend(response.context['comments'])
+        cursor = response.context['next_cursor']
+    assert seen == list(news.comment_set.order_by('created', 'pk'))
+
+
 def test_comment_form_access_for_anonymous_user(client, news, detail_url):
     """Анонимному пользователю недоступна форма для отправки
     комментария на странице отдельной новости.
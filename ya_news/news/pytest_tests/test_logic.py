@@ -1,9 +1,19 @@
+import json
 from http import HTTPStatus
+from unittest import mock
 
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
 from pytest_django.asserts import assertRedirects, assertFormError
 
+from news import replicas
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.models import Comment, FixtureProgress, News
+from news.moderation import BadWordsMatcher
+from news.replicas import PrimaryReplicaRouter
 
 
 BAD_WORDS_COMMENT = {'text': f'Текст {BAD_WORDS[0]} текст'}
@@ -12,25 +22,172 @@ BAD_WORDS_COMMENT = {'text': f'Текст {BAD_WORDS[0]} текст'}
 def test_anonymous_user_cant_create_comment(client, new_comment, news,
                                             detail_url):
     """Анонимный пользователь не может отправить комментарий."""
+    comments_count = Comment.objects.count()
     client.post(detail_url, data=new_comment)
-    assert Comment.objects.count() == 0
+    assert Comment.objects.count() == comments_count
 
 
 def test_user_can_create_comment(author_client, author, new_comment, news,
                                  detail_url):
     """Авторизованный пользователь может отправить комментарий."""
+    comments_count = Comment.objects.count()
     author_client.post(detail_url, data=new_comment)
-    assert Comment.objects.count() == 1
-    comment = Comment.objects.get()
+    assert Comment.objects.count() == comments_count + 1
+    comment = Comment.objects.latest('pk')
     assert comment.text == new_comment['text']
     assert comment.news == news
     assert comment.author == author
 
 
+def test_comment_count_follows_comments(author_client, new_comment, news,
+                                        detail_url):
+    """Счётчик комментариев новости обновляется при создании
+    и удалении комментария.
+    """
+    comments_count = news.comment_count
+    author_client.post(detail_url, data=new_comment)
+    news.refresh_from_db()
+    assert news.comment_count == comments_count + 1
+    Comment.objects.latest('pk').delete()
+    news.refresh_from_db()
+    assert news.comment_count == comments_count
+
+
+def test_recount_comments_restores_counter(news, list_comments):
+    """Пересчёт восстанавливает рассинхронизированный счётчик."""
+    News.objects.update(comment_count=0)
+    News.recount_comments()
+    news.refresh_from_db()
+    assert news.comment_count == Comment.objects.filter(news=news).count()
+
+
+def test_news_delete_does_not_load_comments(django_assert_max_num_queries,
+                                            news, list_comments):
+    """Комментарии удаляются вместе с новостью без загрузки по одному."""
+    news_id = news.pk
+    with django_assert_max_num_queries(3):
+        news.delete()
+    assert not Comment.objects.filter(news_id=news_id).exists()
+
+
+def test_user_delete_recounts_comments(author, news, list_comments):
+    """После удаления пользователя счётчики его новостей пересчитаны."""
+    author.delete()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_bulk_comment_delete_recounts_comments(news, comment, list_comments):
+    """Удаление комментариев одним запросом пересчитывает счётчик
+    и отмечает изменение новости.
+    """
+    modified = news.modified
+    list_comments.delete()
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    assert news.modified > modified
+    Comment.objects.filter(news=news).delete()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_import_comments(tmp_path, author, news):
+    """Импорт пропускает записи с запрещёнными словами, ссылками
+    на несуществующие новости и некорректными полями и обновляет
+    счётчик комментариев.
+    """
+    last_pk = Comment.objects.latest('pk').pk
+    rows = [
+        {'news': news.id, 'author': author.username, 'text': 'Первый'},
+        {'news': news.id, 'author': author.username, 'text': 'Второй'},
+        {'news': news.id, 'author': author.username,
+         'text': BAD_WORDS_COMMENT['text']},
+        {'news': news.id + 1, 'author': author.username, 'text': 'Текст'},
+        {'news': news.id, 'author': 'Неизвестный', 'text': 'Текст'},
+        {'news': news.id, 'author': author.username, 'text': 42},
+        {'news': news.id, 'author': ['список'], 'text': 'Текст'},
+        ['не', 'объект'],
+        17,
+    ]
+    path = tmp_path / 'comments.ndjson'
+    path.write_text(
+        '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows),
+        encoding='utf-8',
+    )
+    comments_count = news.comment_count
+    call_command('import_comments', str(path), batch_size=2)
+    assert list(
+        Comment.objects.filter(pk__gt=last_pk).values_list(
+            'text', flat=True
+        ).order_by('pk')
+    ) == ['Первый', 'Второй']
+    news.refresh_from_db()
+    assert news.comment_count == comments_count + 2
+
+
+def test_load_news_fixture_resume(tmp_path, author):
+    """После сбоя загрузка фикстуры продолжается с места остановки,
+    не дублируя записи, и сохраняет даты комментариев.
+    """
+    news_count = News.objects.count()
+    first = News.objects.latest('pk').pk + 1
+    records = [
+        {'model': 'news.news', 'pk': pk,
+         'fields': {'title': f'Новость {pk}', 'text': 'Текст',
+                    'date': '2022-11-01'}}
+        for pk in range(first, first + 3)
+    ]
+    broken = {'model': 'news.news', 'fields': {'date': 'не дата'}}
+    comment = {'model': 'news.comment',
+               'fields': {'news': first, 'author': author.pk,
+                          'text': 'Текст',
+                          'created': '2022-11-02T10:00:00Z'}}
+    path = tmp_path / 'news.json'
+    path.write_text(json.dumps(records + [broken, comment]))
+    with pytest.raises(CommandError):
+        call_command('load_news_fixture', str(path), batch_size=1)
+    assert News.objects.count() == news_count + 3
+    path.write_text(json.dumps(records + [comment]))
+    call_command('load_news_fixture', str(path), batch_size=1, resume=True)
+    assert News.objects.count() == news_count + 3
+    assert News.objects.get(pk=first).comment_count == 1
+    assert Comment.objects.get(news_id=first).created.year == 2022
+    assert not FixtureProgress.objects.exists()
+
+
+def test_load_news_fixture_keeps_auto_dates_of_other_saves(
+    tmp_path, author, news
+):
+    """Даты из фикстуры сохраняются, а остальные сохранения в том же
+    процессе по-прежнему получают текущее время.
+    """
+    path = tmp_path / 'comments.json'
+    path.write_text(json.dumps([
+        {'model': 'news.comment',
+         'fields': {'news': news.pk, 'author': author.pk,
+                    'text': 'Из фикстуры',
+                    'created': '2022-11-02T10:00:00Z',
+                    'modified': '2022-11-02T10:00:00Z'}},
+    ]))
+    saved = []
+
+    def save_other(news_ids):
+        saved.append(Comment.objects.create(
+            news=news, author=author, text='Параллельно'
+        ))
+
+    with mock.patch.object(News, 'recount_comments', side_effect=save_other):
+        call_command('load_news_fixture', str(path))
+    loaded = Comment.objects.get(text='Из фикстуры')
+    assert loaded.created.year == loaded.modified.year == 2022
+    assert saved[0].created.date() == timezone.now().date()
+
+
 def test_user_cant_use_bad_words(author_client, news, detail_url):
     """Если комментарий содержит запрещённые слова, он не будет
     опубликован, а форма вернёт ошибку.
     """
+    comments_count = Comment.objects.count()
     response = author_client.post(detail_url, data=BAD_WORDS_COMMENT)
     assertFormError(
         response,
@@ -38,8 +195,34 @@ def test_user_cant_use_bad_words(author_client, news, detail_url):
         field='text',
         errors=WARNING
     )
-    comments_count = Comment.objects.count()
-    assert comments_count == 0
+    assert Comment.objects.count() == comments_count
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    (
+        ('Ты НЕГОДЯЙ!', 'негодяй'),
+        ('Ты нeгoдяй!', 'негодяй'),
+        ('PEДИCKA', 'редиска'),
+        ('Ты нег0дяй', 'негодяй'),
+        ('ред1ска', None),
+        ('Вежливый текст', None),
+        ('', None),
+    ),
+)
+def test_bad_words_matcher(text, expected):
+    """Автомат находит слова словаря, в том числе замаскированные
+    латинскими буквами.
+    """
+    assert BadWordsMatcher(BAD_WORDS).find(text) == expected
+
+
+def test_bad_words_matcher_overlapping_words():
+    """Слово находится и внутри другого, частично совпавшего слова."""
+    matcher = BadWordsMatcher(('абвг', 'бв', 'вгд'))
+    assert matcher.find('xабвx') == 'бв'
+    assert matcher.find('абвгд') == 'бв'
+    assert matcher.find('xxвгдxx') == 'вгд'
 
 
 def test_author_can_edit_comment(author_client, new_comment, news, comment,
@@ -80,7 +263,53 @@ def test_user_cant_delete_comment_of_another_user(admin_client, new_comment,
     """Авторизованный пользователь не может редактировать
     или удалять чужие комментарии.
     """
+    comments_count = Comment.objects.count()
     response = admin_client.post(delete_comment_url)
     assert response.status_code == HTTPStatus.NOT_FOUND
-    comments_count = Comment.objects.count()
-    assert comments_count == 1
+    assert Comment.objects.count() == comments_count
+
+
+@pytest.mark.parametrize(
+    'pinned, expected',
+    ((False, 'replica1'), (True, 'default')),
+)
+def test_router_reads_from_replica_unless_pinned(settings, pinned, expected):
+    """Чтение идёт на реплику, если запрос не прикреплён к основной БД."""
+    settings.NEWS_READ_REPLICAS = ('replica1',)
+    router = PrimaryReplicaRouter()
+    token = replicas._read_from_primary.set(pinned)
+    try:
+        assert router.db_for_read(News) == expected
+        assert router.db_for_read(get_user_model()) == 'default'
+    finally:
+        replicas._read_from_primary.reset(token)
+    assert router.db_for_write(News) == 'default'
+    assert not router.allow_migrate('replica1', 'news')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_sync_and_read_your_writes(settings, replica, author_client,
+                                           new_comment, news, detail_url):
+    """Реплику обновляет sync_replicas, а не запрос; после своей записи
+    пользователь читает из основной БД, пока не истечёт cookie.
+    """
+    call_command('sync_replicas')
+    assert News.objects.all().db == replica
+    assert News.objects.filter(pk=news.pk).exists()
+    comments_count = Comment.objects.using(replica).count()
+    response = author_client.post(detail_url, data=new_comment)
+    cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+    assert cookie['max-age'] == settings.REPLICA_PIN_SECONDS
+    # Запрос не копирует БД: реплика отстала от основной.
+    assert Comment.objects.using(replica).count() == comments_count
+    assert new_comment['text'] in author_client.get(
+        detail_url
+    ).content.decode()
+    replicas.sync_replicas()
+    assert Comment.objects.using(replica).count() == comments_count + 1
+    Comment.objects.update(text='Свежий текст')
+    assert 'Свежий текст' in author_client.get(detail_url).content.decode()
+    del author_client.cookies[settings.REPLICA_PIN_COOKIE]
+    assert 'Свежий текст' not in author_client.get(
+        detail_url
+    ).content.decode()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from news.profiling import make_token
+
+
+@pytest.fixture
+def profiles(tmp_path, settings):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = tmp_path
+    return tmp_path
+
+
+def saved(directory):
+    return [
+        json.loads(path.read_text())
+        for path in sorted(directory.glob('*.json'))
+    ]
+
+
+def test_signed_header_profiles_request(client, profiles, detail_url):
+    """Запрос с подписанным заголовком сохраняет профиль с SQL
+    и временем шаблонов.
+    """
+    client.get(detail_url, HTTP_X_PROFILE=make_token())
+    (meta,) = saved(profiles)
+    assert meta['url_name'] == 'news:detail'
+    assert meta['status'] == 200
+    assert meta['queries']
+    assert 0 < meta['template_time'] < meta['duration']
+    assert len(list(profiles.glob('*.prof'))) == 1
+
+
+@pytest.mark.parametrize('header', (None, 'profile', 'profile:bad:sign'))
+def test_request_without_valid_token_not_profiled(
+    client, profiles, detail_url, header
+):
+    """Без подписанного заголовка и без выборки профиль не пишется."""
+    extra = {'HTTP_X_PROFILE': header} if header else {}
+    client.get(detail_url, **extra)
+    assert not saved(profiles)
+
+
+def test_profiling_disabled_by_setting(client, profiles, settings, home_url):
+    """Выключенное профилирование не смотрит даже на заголовок."""
+    settings.PROFILING_ENABLED = False
+    client.get(home_url, HTTP_X_PROFILE=make_token())
+    assert not saved(profiles)
+
+
+def test_sample_rate_profiles_without_header(
+    client, profiles, settings, home_url
+):
+    """При доле выборки 1 профилируется каждый запрос."""
+    settings.PROFILING_SAMPLE_RATE = 1
+    client.get(home_url)
+    client.get(home_url)
+    assert [meta['url_name'] for meta in saved(profiles)] == [
+        'news:home', 'news:home'
+    ]
+
+
+def test_store_keeps_latest_profiles(client, profiles, settings, home_url):
+    """Хранятся только последние PROFILING_MAX_FILES профилей."""
+    settings.PROFILING_SAMPLE_RATE = 1
+    settings.PROFILING_MAX_FILES = 2
+    for _ in range(3):
+        client.get(home_url)
+    assert len(saved(profiles)) == 2
+    assert len(list(profiles.glob('*.prof'))) == 2
+
+
+def test_profile_report(client, profiles, settings, detail_url, capsys):
+    """Сводка группирует профили по имени URL."""
+    settings.PROFILING_SAMPLE_RATE = 1
+    client.get(detail_url)
+    call_command('profile_report', top=3)
+    output = capsys.readouterr().out
+    assert 'news:detail: профилей 1' in output
+    assert 'SELECT' in output
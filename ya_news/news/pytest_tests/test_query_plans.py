@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from news.pagination import encode_cursor
+
+TABLES = ('news_news', 'news_comment')
+
+
+def query_plans(client, url):
+    """Планы выполнения SELECT-запросов к новостям и комментариям."""
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(
+                table in sql for table in TABLES
+            ):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+    assert plans, 'Не перехвачено ни одного запроса к новостям.'
+    return plans
+
+
+def assert_uses_indexes(plans):
+    for sql, steps in plans:
+        for step in steps:
+            assert 'TEMP B-TREE' not in step, (sql, steps)
+            if step.startswith('SCAN'):
+                assert 'USING' in step, (sql, steps)
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Формат плана SQLite.'
+)
+@pytest.mark.parametrize('with_cursor', (False, True))
+def test_news_list_query_plan(client, news, with_cursor, home_url):
+    """Лента новостей читается по индексу без сортировки во временном
+    B-дереве — и первая страница, и страница по курсору.
+    """
+    url = home_url
+    if with_cursor:
+        news.refresh_from_db()
+        url += f'?cursor={encode_cursor(news.date, news.pk)}'
+    assert_uses_indexes(query_plans(client, url))
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Формат плана SQLite.'
+)
+@pytest.mark.parametrize('with_cursor', (False, True))
+def test_news_detail_query_plan(client, comment, with_cursor, detail_url):
+    """Новость и её комментарии читаются по индексам, комментарии
+    не сортируются во временном B-дереве.
+    """
+    url = detail_url
+    if with_cursor:
+        url = reverse('news:comments', args=(comment.news_id,)) + (
+            f'?cursor={encode_cursor(comment.created, comment.pk)}'
+        )
+    assert_uses_indexes(query_plans(client, url))
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 import pytest
+from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 from pytest_lazyfixture import lazy_fixture
 
@@ -10,6 +11,7 @@ LOGIN_URL = lazy_fixture('login_url')
 LOGOUT_URL = lazy_fixture('logout_url')
 SIGNUP_URL = lazy_fixture('signup_url')
 DETAIL_URL = lazy_fixture('detail_url')
+COMMENTS_URL = lazy_fixture('comments_url')
 EDIT_COMMENT_URL = lazy_fixture('edit_comment_url')
 DELETE_COMMENT_URL = lazy_fixture('delete_comment_url')
 
@@ -26,6 +28,7 @@ NOT_AUTHOR_FIXTURE = lazy_fixture('not_author_client')
         (LOGOUT_URL, CLIENT_FIXTURE, HTTPStatus.OK),
         (SIGNUP_URL, CLIENT_FIXTURE, HTTPStatus.OK),
         (DETAIL_URL, CLIENT_FIXTURE, HTTPStatus.OK),
+        (COMMENTS_URL, CLIENT_FIXTURE, HTTPStatus.OK),
         (EDIT_COMMENT_URL, AUTHOR_CLIENT_FIXTURE, HTTPStatus.OK),
         (DELETE_COMMENT_URL, AUTHOR_CLIENT_FIXTURE, HTTPStatus.OK),
         (EDIT_COMMENT_URL, NOT_AUTHOR_FIXTURE, HTTPStatus.NOT_FOUND),
@@ -49,3 +52,9 @@ def test_redirect_for_anonymous_client(client, url, login_url):
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+def test_comments_of_missing_news(client, news):
+    """Для несуществующей новости фрагмент с комментариями не отдаётся."""
+    url = reverse('news:comments', args=(news.id + 1,))
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND
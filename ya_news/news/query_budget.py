@@ -0,0 +1,176 @@
+"""
+Учёт SQL-запросов и бюджеты запросов для view.
+
+``QueryBudgetMiddleware`` считает запросы и время SQL на каждый запрос
+к сайту и копит статистику по имени URL. Каждые
+``settings.QUERY_STATS_LOG_EVERY`` запросов статистика процесса пишется
+в лог, а ``get_url_stats`` отдаёт её текущий снимок. Бюджет задаётся атрибутом
+``query_budget`` у класса view или декоратором ``query_budget`` у
+функции. Превышение бюджета пишется в лог, а при
+``settings.QUERY_BUDGET_STRICT`` — приводит к исключению (так работают
+тесты).
+
+Обёртка ``record_query`` подключается к каждому новому соединению
+с БД в любом потоке (см. ``install_recorder``), а статистика текущего
+запроса передаётся через contextvars. Поэтому учитываются и запросы,
+которые под ASGI выполняются в потоке ``sync_to_async`` или в пуле
+``news.async_views``.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+_current_stats = ContextVar('query_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """View выполнила больше запросов, чем ей разрешено."""
+
+
+class QueryStats:
+    """Количество запросов и суммарное время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Накопленная статистика: имя URL -> запросов к сайту, SQL-запросов, время.
+url_stats = defaultdict(lambda: {'requests': 0, 'queries': 0, 'time': 0.0})
+_url_stats_lock = threading.Lock()
+_total_requests = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка ``execute_wrapper``: учитывает запрос в текущей статистике."""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install_recorder(sender, connection, **kwargs):
+    """Обработчик ``connection_created``: подключаем учёт к соединению."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def track_queries():
+    """Считаем запросы ко всем БД внутри блока ``with``."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def add_url_stats(url_name, stats):
+    """Добавляем запрос к сайту в статистику; возвращаем их общее число."""
+    global _total_requests
+    with _url_stats_lock:
+        totals = url_stats[url_name]
+        totals['requests'] += 1
+        totals['queries'] += stats.count
+        totals['time'] += stats.duration
+        _total_requests += 1
+        return _total_requests
+
+
+def get_url_stats():
+    """Снимок статистики: имя URL -> запросов к сайту, SQL-запросов, время."""
+    with _url_stats_lock:
+        return {name: dict(totals) for name, totals in url_stats.items()}
+
+
+def log_url_stats():
+    """Пишем в лог статистику по URL, самые «дорогие» по SQL — первыми."""
+    snapshot = get_url_stats()
+    for url_name, totals in sorted(
+        snapshot.items(), key=lambda item: item[1]['time'], reverse=True
+    ):
+        requests = totals['requests']
+        logger.info(
+            '%s: запросов к сайту %d, SQL-запросов на запрос %.1f, '
+            'время SQL на запрос %.1f мс',
+            url_name, requests, totals['queries'] / requests,
+            totals['time'] * 1000 / requests,
+        )
+
+
+def query_budget(limit):
+    """Декоратор, задающий бюджет запросов для view-функции."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Бюджет view: у функции или у класса, из которого она получена."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+class QueryBudgetMiddleware(MiddlewareMixin):
+    """
+    Считает запросы к БД и проверяет бюджет view.
+
+    ``MiddlewareMixin`` даёт поддержку и WSGI, и ASGI: под ASGI
+    используется ``__acall__``, и запрос не переводится в синхронный
+    режим ради этого middleware.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with track_queries() as stats:
+            response = self.get_response(request)
+        self.check(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        with track_queries() as stats:
+            response = await self.get_response(request)
+        self.check(request, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+
+    def check(self, request, stats):
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        total = add_url_stats(url_name, stats)
+        log_every = settings.QUERY_STATS_LOG_EVERY
+        if log_every and total % log_every == 0:
+            log_url_stats()
+        budget = getattr(request, 'query_budget', None)
+        if budget is None or stats.count <= budget:
+            return
+        message = (
+            f'{request.method} {request.path} ({url_name}): '
+            f'{stats.count} запросов к БД при бюджете {budget}, '
+            f'{stats.duration * 1000:.1f} мс'
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
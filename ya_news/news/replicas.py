@@ -0,0 +1,109 @@
+"""
+Чтение с реплик БД и запись в основную.
+
+``PrimaryReplicaRouter`` отправляет чтение новостей и комментариев на
+одну из реплик из ``settings.NEWS_READ_REPLICAS``, а запись и всё
+остальное — в ``default``. Чтение
+«прикрепляется» к основной БД, если запрос изменяет данные, если
+view объявила ``read_from_primary = True``, в админке и в течение
+``settings.REPLICA_PIN_SECONDS`` после того, как пользователь что-то
+изменил: так он сразу видит, например, свой комментарий.
+
+Настоящей репликации у SQLite нет. Её заменяет ``sync_replicas``:
+файл основной БД копируется в реплики средствами backup API SQLite.
+Копирует его команда ``sync_replicas`` — однократно или периодически
+с ``--interval``, отдельным процессом, а не в ответ на запрос. Чтобы
+пользователь не увидел устаревшую реплику, интервал не должен
+превышать ``REPLICA_PIN_SECONDS``.
+"""
+import random
+import sqlite3
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+_read_from_primary = ContextVar('read_from_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.NEWS_READ_REPLICAS
+        if (
+            not replicas
+            or model._meta.app_label != 'news'
+            or _read_from_primary.get()
+        ):
+            # Пользователи, сессии и админка всегда читаются из основной БД.
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаем оттуда же, откуда сам объект.
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Схема попадает в реплики вместе с данными при копировании."""
+        return db == DEFAULT_DB_ALIAS
+
+
+def sync_replicas():
+    """Копируем основную БД SQLite во все реплики."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.vendor != 'sqlite':
+        return
+    primary.ensure_connection()
+    for alias in settings.NEWS_READ_REPLICAS:
+        replica = connections[alias]
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Решает, читать ли запросу с основной БД."""
+
+    def process_request(self, request):
+        if (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        ):
+            _read_from_primary.set(True)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (
+            request.resolver_match.app_name == 'admin'
+            or getattr(view_class, 'read_from_primary', False)
+        ):
+            _read_from_primary.set(True)
+
+    def process_response(self, request, response):
+        _read_from_primary.set(False)
+        if (
+            request.method in ('GET', 'HEAD', 'OPTIONS')
+            or response.status_code >= 400
+            or not settings.NEWS_READ_REPLICAS
+        ):
+            return response
+        # Реплики догонят основную БД при следующем запуске
+        # sync_replicas, а пока пользователь читает из неё.
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE,
+            '1',
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+        return response
@@ -0,0 +1,141 @@
+"""
+Полнотекстовый поиск по новостям на SQLite FTS5.
+
+Индекс ``news_news_fts`` хранит только токены (external content) и
+поддерживается триггерами на ``news_news``, поэтому учитывает и
+``bulk_create``, и изменения из админки. При перестройке таблицы
+миграциями SQLite удаляет её триггеры; ``install_triggers`` создаёт
+их заново после каждой миграции.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .sqlite import trigger_installer
+
+FTS_TABLE = 'news_news_fts'
+
+TRIGGERS_SQL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_insert
+    AFTER INSERT ON news_news BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_delete
+    AFTER DELETE ON news_news BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_update
+    AFTER UPDATE OF title, text ON news_news BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+
+install_triggers = trigger_installer(FTS_TABLE, TRIGGERS_SQL)
+
+# Границы подсветки: управляющие символы не встречаются в тексте,
+# поэтому после экранирования их можно безопасно заменить на теги.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+# Заголовок весит больше текста.
+SCORE = f'bm25({FTS_TABLE}, 10.0, 1.0)'
+
+PAGE_SQL = f"""
+    SELECT rowid, {SCORE} AS score
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+    {{after}}
+    ORDER BY score, rowid
+    LIMIT %s
+"""
+
+AFTER_SQL = f'AND ({SCORE} > %s OR ({SCORE} = %s AND rowid > %s))'
+
+HIGHLIGHT_SQL = f"""
+    SELECT
+        {FTS_TABLE}.rowid,
+        highlight({FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}'),
+        snippet({FTS_TABLE}, 1, '{MARK_START}', '{MARK_END}', '…', 24),
+        news_news.date
+    FROM {FTS_TABLE}
+    JOIN news_news ON news_news.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid IN ({{ids}})
+"""
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """
+    Переводим пользовательский запрос в выражение FTS5.
+
+    Каждое слово берём в кавычки, чтобы символы синтаксиса FTS5
+    в запросе не приводили к ошибкам; слова объединяются через AND.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def highlighted(text):
+    """Экранируем текст и превращаем границы подсветки в ``<mark>``."""
+    return mark_safe(
+        escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    )
+
+
+def search(query, limit, after=None):
+    """
+    Страница результатов поиска, от самых релевантных.
+
+    ``after`` — пара (score, id) последнего результата предыдущей
+    страницы. Сначала выбираем только id и оценки страницы, а
+    подсветку считаем лишь для них: так её стоимость не зависит от
+    общего числа совпадений.
+    """
+    match = build_match(query)
+    if not match:
+        return []
+    params = [match]
+    after_sql = ''
+    if after is not None:
+        score, pk = after
+        after_sql = AFTER_SQL
+        params += [score, score, pk]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            PAGE_SQL.format(after=after_sql), params + [limit]
+        )
+        page = cursor.fetchall()
+        if not page:
+            return []
+        ids = [pk for pk, _ in page]
+        cursor.execute(
+            HIGHLIGHT_SQL.format(ids=', '.join(['%s'] * len(ids))),
+            [match] + ids,
+        )
+        details = {row[0]: row[1:] for row in cursor.fetchall()}
+    return [
+        {
+            'pk': pk,
+            'score': score,
+            'title': highlighted(details[pk][0]),
+            'snippet': highlighted(details[pk][1]),
+            'date': details[pk][2],
+        }
+        for pk, score in page
+    ]
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache
+from .models import Comment, News
+
+
+@receiver(post_save, sender=Comment)
+def update_commented_news(sender, instance, created, raw=False, **kwargs):
+    """
+    Отмечаем изменение новости при создании и правке комментария.
+
+    При создании заодно увеличиваем счётчик комментариев.
+    """
+    if raw:
+        return
+    changes = {'modified': timezone.now()}
+    if created:
+        changes['comment_count'] = F('comment_count') + 1
+    News.objects.filter(pk=instance.news_id).update(**changes)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def remember_commented_news(sender, instance, **kwargs):
+    """Запоминаем новости, которые потеряют комментарии пользователя."""
+    instance._commented_news = list(
+        Comment.objects.filter(author=instance).values_list(
+            'news_id', flat=True
+        ).distinct()
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_commented_news(sender, instance, **kwargs):
+    """
+    Пересчитываем счётчики после каскадного удаления комментариев.
+
+    Комментарии удаляются одним запросом, без вызова ``Comment.delete``.
+    """
+    news_ids = getattr(instance, '_commented_news', None)
+    if news_ids:
+        News.comments_removed(news_ids)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Comment)
+def invalidate_home_page(sender, **kwargs):
+    """
+    Любое изменение новостей или комментариев меняет версию ленты.
+
+    Удаление комментария обрабатывает ``Comment.delete``.
+    """
+    cache.bump_version()
@@ -0,0 +1,31 @@
+"""Особенности SQLite, общие для модулей приложения."""
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def run_on_sqlite(statements):
+    """Операция ``RunPython``, которая выполняет SQL только на SQLite."""
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+def trigger_installer(table, triggers_sql):
+    """
+    Обработчик post_migrate, который возвращает триггеры ``table``.
+
+    Перестраивая таблицу, миграции SQLite удаляют её триггеры, а
+    ``triggers_sql`` создаёт их, только если их нет.
+    """
+    def install_triggers(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+        db = connections[using]
+        if db.vendor != 'sqlite' or table not in (
+            db.introspection.table_names()
+        ):
+            return
+        with db.cursor() as cursor:
+            for sql in triggers_sql:
+                cursor.execute(sql)
+    return install_triggers
@@ -1,39 +1,116 @@
+from datetime import datetime
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
+from . import cache, conditional, search
 from .forms import CommentForm
 from .models import Comment, News
+from .pagination import after, decode_cursor, encode_cursor
+
+
+def get_comments_page(news_pk, cursor=None):
+    """
+    Страница комментариев новости в хронологическом порядке.
+
+    Берём на одну запись больше размера страницы, чтобы узнать,
+    есть ли продолжение, не делая отдельного запроса.
+    """
+    page_size = settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+    comments = Comment.objects.filter(news_id=news_pk).select_related(
+        'author'
+    ).order_by('created', 'pk')
+    if cursor:
+        comments = comments.filter(
+            after('created', *decode_cursor(cursor, datetime.fromisoformat))
+        )
+    page = list(comments[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1].created, page[-1].pk)
+    return {'comments': page, 'next_cursor': next_cursor, 'news_pk': news_pk}
 
 
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
+    query_budget = 4
     template_name = 'news/home.html'
 
+    @method_decorator(vary_on_cookie)
+    @method_decorator(condition(
+        etag_func=conditional.home_etag,
+        last_modified_func=conditional.home_last_modified,
+    ))
+    def get(self, request, *args, **kwargs):
+        """
+        Анонимным пользователям отдаём ленту из кеша.
+
+        Страница для авторизованных пользователей содержит их данные
+        в шапке, поэтому её не кешируем.
+        """
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = cache.page_key(conditional.home_fingerprint(request))
+        content = cache.get_page(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(
+            lambda response: cache.set_page(key, response.content)
+        )
+        return response
+
     def get_queryset(self):
         """
-        Выводим только несколько последних новостей.
+        Выводим страницу из нескольких новостей, начиная с курсора.
+
+        Размер страницы определяется в настройках проекта. Курсор —
+        это (date, id) последней новости предыдущей страницы, так что
+        глубина листания не влияет на стоимость запроса.
+        """
+        return conditional.home_queryset(self.request.GET.get('cursor'))
 
-        Их количество определяется в настройках проекта.
+    def get_context_data(self, **kwargs):
+        """
+        Добавляем курсор на следующую страницу.
+
+        Лишний запрос на проверку «есть ли ещё» не делаем: ссылка
+        показывается, если текущая страница заполнена целиком.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        context = super().get_context_data(**kwargs)
+        page = list(self.object_list)
+        if len(page) == settings.NEWS_COUNT_ON_HOME_PAGE:
+            last = page[-1]
+            context['next_cursor'] = encode_cursor(last.date, last.pk)
+        context['is_first_page'] = 'cursor' not in self.request.GET
+        return context
 
 
-class NewsDetail(generic.DetailView):
+class CommentPageMixin:
+    """Добавляет в контекст первую страницу комментариев новости."""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(get_comments_page(self.object.pk))
+        return context
+
+
+class NewsDetail(CommentPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        """Комментарии не загружаем: они выводятся постранично."""
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -44,6 +121,7 @@ class NewsDetail(generic.DetailView):
 
 class NewsComment(
         LoginRequiredMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -63,12 +141,59 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        """Новость уже загружена в ``post``, повторно не запрашиваем."""
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
+
+
+class NewsCommentList(generic.TemplateView):
+    """Следующая страница комментариев новости в виде HTML-фрагмента."""
+    query_budget = 3
+    template_name = 'includes/comments.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(get_comments_page(
+            self.kwargs['pk'], self.request.GET.get('cursor')
+        ))
+        # Пустая страница бывает и у несуществующей новости: проверяем
+        # только в этом случае, чтобы не тратить запрос на каждую страницу.
+        if (
+            not context['comments']
+            and not News.objects.filter(pk=self.kwargs['pk']).exists()
+        ):
+            raise Http404('Новость не найдена')
+        return context
+
+
+class NewsSearch(generic.TemplateView):
+    """Полнотекстовый поиск по заголовкам и текстам новостей."""
+    template_name = 'news/search.html'
+    query_budget = 4
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        cursor = self.request.GET.get('cursor')
+        after = decode_cursor(cursor, float) if cursor else None
+        page_size = settings.NEWS_SEARCH_PAGE_SIZE
+        results = search.search(query, page_size, after) if query else []
+        if len(results) == page_size:
+            last = results[-1]
+            context['next_cursor'] = encode_cursor(last['score'], last['pk'])
+        context.update(query=query, results=results)
+        return context
 
 
 class NewsDetailView(generic.View):
+    query_budget = 5
 
+    @method_decorator(vary_on_cookie)
+    @method_decorator(condition(
+        etag_func=conditional.detail_etag,
+        last_modified_func=conditional.detail_last_modified,
+    ))
     def get(self, request, *args, **kwargs):
         view = NewsDetail.as_view()
         return view(request, *args, **kwargs)
@@ -81,24 +206,33 @@ class NewsDetailView(generic.View):
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
+    read_from_primary = True
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Комментарий уже загружен view, берём id новости из него."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
-        """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        """
+        Пользователь может работать только со своими комментариями.
+
+        Новость нужна шаблонам, поэтому загружаем её тем же запросом.
+        """
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
     """Редактирование комментария."""
+    query_budget = 5
     template_name = 'news/edit.html'
     form_class = CommentForm
 
 
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
+    query_budget = 5
     template_name = 'news/delete.html'
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,7 +22,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.profiling.ProfilingMiddleware',
+    'news.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'news.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,10 +58,54 @@ WSGI_APPLICATION = 'yanews.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('YANEWS_DB', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Реплики для чтения: YANEWS_REPLICAS=2 добавит replica1 и replica2,
+# файлы которых лежат рядом с основной БД.
+NEWS_READ_REPLICAS = tuple(
+    f'replica{number}'
+    for number in range(1, int(os.getenv('YANEWS_REPLICAS', 0)) + 1)
+)
+for alias in NEWS_READ_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(DATABASES['default']['NAME']).with_name(
+            f'db_{alias}.sqlite3'
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['news.replicas.PrimaryReplicaRouter']
+# Сколько секунд после изменения данных пользователь читает из основной БД.
+# Реплики обновляет ``manage.py sync_replicas --interval N`` с N не больше
+# этого значения.
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'read_primary'
+
+
+# Для нескольких процессов подойдёт, например, файловый кеш:
+# 'django.core.cache.backends.filebased.FileBasedCache'
+# с 'LOCATION': BASE_DIR / 'cache'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Сессии читаются из кеша и дублируются в БД, поэтому переживают его
+# сброс. Другой движок задаётся через YANEWS_SESSION_ENGINE.
+SESSION_ENGINE = os.getenv(
+    'YANEWS_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'
+)
+
+# Пользователь берётся из кеша, а не из БД, на каждом запросе. При
+# нескольких процессах кеш должен быть общим, иначе смена пароля
+# дойдёт до остальных процессов только через USER_CACHE_TIMEOUT.
+AUTHENTICATION_BACKENDS = ['news.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 5
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -79,4 +127,46 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
+# Превышение бюджета запросов view: False — запись в лог,
+# True — исключение (включается в тестах).
+QUERY_BUDGET_STRICT = False
+# Раз в столько запросов статистика SQL по URL пишется в лог (0 — никогда).
+QUERY_STATS_LOG_EVERY = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'news.query_budget': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 NEWS_COUNT_ON_HOME_PAGE = 10
+NEWS_HOME_CACHE_TIMEOUT = 60 * 60
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+NEWS_SEARCH_PAGE_SIZE = 20
+
+# Асинхронные страницы новостей; включаются в yanews/asgi.py.
+NEWS_ASYNC_VIEWS = os.getenv('NEWS_ASYNC_VIEWS') == '1'
+# Размер пула потоков для БД и шаблонов асинхронных страниц.
+NEWS_ASYNC_THREADS = int(os.getenv('NEWS_ASYNC_THREADS', 16))
+
+# Дополнительный словарь запрещённых слов: по слову в строке.
+BAD_WORDS_FILE = None
+# Ловить подмену кириллицы похожими латинскими буквами и цифрами.
+BAD_WORDS_NORMALIZE = True
+
+# Профилирование запросов (news.profiling). Когда оно включено,
+# профилируются запросы с заголовком PROFILING_HEADER, значение которого
+# печатает ``profile_report --token``, и доля PROFILING_SAMPLE_RATE
+# остальных. Хранятся последние PROFILING_MAX_FILES профилей.
+PROFILING_ENABLED = os.getenv('YANEWS_PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.getenv('YANEWS_PROFILING_SAMPLE_RATE', 0))
+PROFILING_HEADER = 'X-Profile'
+# Сколько секунд действительно значение заголовка.
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_DIR = Path(os.getenv('YANEWS_PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = 1000
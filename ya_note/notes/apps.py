@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import api, backends, search  # noqa: F401
+        post_migrate.connect(search.install_triggers, sender=self)
+        post_migrate.connect(api.install_triggers, sender=self)
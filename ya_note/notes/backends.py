@@ -0,0 +1,45 @@
+"""
+Бэкенд аутентификации с кешем пользователей.
+
+``AuthenticationMiddleware`` на каждом запросе загружает пользователя
+по id из сессии. Бэкенд держит объект пользователя в кеше, а сессии
+читаются из кеша (``cached_db``), так что прогретый запрос
+авторизованного пользователя не обращается к БД ради аутентификации.
+Запись сбрасывается при сохранении и удалении пользователя и при
+выходе из аккаунта.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    """Смена пароля, блокировка и любые правки сбрасывают кеш."""
+    cache.delete(user_key(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(user_key(user.pk))
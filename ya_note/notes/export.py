@@ -0,0 +1,169 @@
+"""
+Потоковая выгрузка заметок пользователя.
+
+Заметки читаются из БД пачками через ``iterator()``, а ответ отдаётся
+частями по мере чтения, так что память не зависит от числа заметок.
+
+Архив собирается своим кодом, а не ``zipfile``: тот держит в памяти
+описание каждого файла до конца записи, и на миллионах заметок это
+сотни мегабайт. Здесь центральный каталог архива копится во временном
+файле и дописывается в ответ в конце.
+"""
+import json
+import struct
+import tempfile
+import time
+import zlib
+from zipfile import ZIP64_LIMIT, ZIP_FILECOUNT_LIMIT
+
+from django.conf import settings
+
+from .models import Note
+
+# Столько байт копим перед отправкой очередной части ответа.
+PART_SIZE = 64 * 1024
+FIELDS = ('title', 'text', 'slug')
+
+# Имена файлов в UTF-8.
+ZIP_UTF8 = 0x800
+ZIP_DEFLATED = 8
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+ZIP_DIRECTORY_HEADER = struct.Struct('<4s6H3L5H2L')
+ZIP64_OFFSET_EXTRA = struct.Struct('<2HQ')
+ZIP64_END = struct.Struct('<4sQ2H2L4Q')
+ZIP64_LOCATOR = struct.Struct('<4sLQL')
+ZIP_END = struct.Struct('<4s4H2LH')
+
+
+def note_rows(user):
+    return Note.objects.filter(author=user).order_by('id').values_list(
+        'id', *FIELDS
+    ).iterator(settings.NOTES_EXPORT_CHUNK_SIZE)
+
+
+def in_parts(pieces):
+    """Склеиваем мелкие куски в части ответа размером около PART_SIZE."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= PART_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def ndjson(user):
+    """Заметки в формате NDJSON, который понимает ``import_notes``."""
+    return in_parts(
+        json.dumps(
+            dict(zip(FIELDS, row[1:])), ensure_ascii=False
+        ).encode() + b'\n'
+        for row in note_rows(user)
+    )
+
+
+def markdown(title, text):
+    return f'# {title}\n\n{text}\n'.encode()
+
+
+def dos_time(timestamp):
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    return (
+        (hour << 11) | (minute << 5) | (second // 2),
+        ((year - 1980) << 9) | (month << 5) | day,
+    )
+
+
+class ZipWriter:
+    """
+    Архив, который пишется только последовательно.
+
+    Каждый файл сжимается в памяти целиком, поэтому размеры и
+    контрольная сумма известны до заголовка, и перематывать вывод
+    не нужно. Смещения больше 2 ГБ и больше 65535 файлов записываются
+    в формате ZIP64.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.directory_size = 0
+        self.offset = 0
+        self.count = 0
+        self.time, self.date = dos_time(time.time())
+
+    def add(self, name, data):
+        """Локальный заголовок и сжатые данные очередного файла."""
+        name = name.encode()
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        header = ZIP_LOCAL_HEADER.pack(
+            b'PK\x03\x04', ZIP_VERSION, ZIP_UTF8, ZIP_DEFLATED,
+            self.time, self.date, crc, len(compressed), len(data),
+            len(name), 0,
+        ) + name
+        self.write_directory_entry(name, crc, len(compressed), len(data))
+        self.offset += len(header) + len(compressed)
+        self.count += 1
+        return header + compressed
+
+    def write_directory_entry(self, name, crc, compressed_size, size):
+        version, offset, extra = ZIP_VERSION, self.offset, b''
+        if offset > ZIP64_LIMIT:
+            version, offset = ZIP64_VERSION, 0xFFFFFFFF
+            extra = ZIP64_OFFSET_EXTRA.pack(1, 8, self.offset)
+        entry = ZIP_DIRECTORY_HEADER.pack(
+            b'PK\x01\x02', version, version, ZIP_UTF8, ZIP_DEFLATED,
+            self.time, self.date, crc, compressed_size, size,
+            len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset,
+        ) + name + extra
+        self.directory.write(entry)
+        self.directory_size += len(entry)
+
+    def finish(self):
+        """Центральный каталог и завершающие записи архива."""
+        self.directory.seek(0)
+        while True:
+            part = self.directory.read(PART_SIZE)
+            if not part:
+                break
+            yield part
+        start, size, count = self.offset, self.directory_size, self.count
+        if (
+            count >= ZIP_FILECOUNT_LIMIT or start > ZIP64_LIMIT
+            or size > ZIP64_LIMIT
+        ):
+            end64 = start + size
+            yield ZIP64_END.pack(
+                b'PK\x06\x06', ZIP64_END.size - 12, ZIP64_VERSION,
+                ZIP64_VERSION, 0, 0, count, count, size, start,
+            ) + ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, end64, 1)
+            count = min(count, 0xFFFF)
+            start = min(start, 0xFFFFFFFF)
+            size = min(size, 0xFFFFFFFF)
+        yield ZIP_END.pack(b'PK\x05\x06', 0, 0, count, count, size, start, 0)
+
+
+def markdown_zip(user):
+    """Заметки в zip-архиве, по файлу Markdown на заметку."""
+    with tempfile.TemporaryFile() as directory:
+        writer = ZipWriter(directory)
+        yield from in_parts(
+            writer.add(f'{slug or pk}.md', markdown(title, text))
+            for pk, title, text, slug in note_rows(user)
+        )
+        yield from writer.finish()
+
+
+FORMATS = {
+    'ndjson': (ndjson, 'application/x-ndjson', 'notes.ndjson'),
+    'zip': (markdown_zip, 'application/zip', 'notes.zip'),
+}
@@ -1,5 +1,3 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
@@ -16,14 +14,27 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
+        """
+        Обрабатывает случай, если slug не уникален.
+
+        Пустой slug подбирает модель при сохранении, с суффиксом,
+        если нужно, поэтому здесь его не проверяем.
+        """
+        slug = self.cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
+            return ''
         if Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def _get_validation_exclusions(self):
+        """
+        Уникальность slug уже проверена в ``clean_slug``.
+
+        Пустой slug модель заменит при сохранении, поэтому проверка
+        модели сочла бы его занятым. Остальные проверки модели
+        остаются.
+        """
+        return super()._get_validation_exclusions() + ['slug']
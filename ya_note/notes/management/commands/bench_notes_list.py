@@ -0,0 +1,109 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from notes.models import Note
+from notes.views import NotesList
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Откатываем тестовые данные после замеров."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время страницы списка заметок для пользователя с '
+        'разным числом заметок: первой, из середины и последней. '
+        'Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[1000, 100_000, 1_000_000],
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--full-limit', type=int, default=100_000,
+            help='До какого размера замерять загрузку списка без страниц.',
+        )
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        self.stdout.write(
+            f'{"заметок":>9} {"первая, мс":>11} {"середина, мс":>13} '
+            f'{"последняя, мс":>14} {"весь список, мс":>16}'
+        )
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.measure_size(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def seed(self, size, batch_size):
+        user = User.objects.create(username=f'bench-{size}')
+        for start in range(0, size, batch_size):
+            Note.objects.bulk_create(
+                Note(
+                    title=f'Заметка {number}',
+                    text='Текст заметки',
+                    slug=f'bench-{size}-{number}',
+                    author=user,
+                )
+                for number in range(start, min(size, start + batch_size))
+            )
+        return user
+
+    def render_page(self, user, after=None):
+        params = {'after': after} if after else {}
+        request = self.factory.get('/notes/', params)
+        request.user = user
+        start = time.perf_counter()
+        NotesList.as_view()(request).render()
+        return time.perf_counter() - start
+
+    def median_ms(self, func, repeat):
+        return statistics.median(func() for _ in range(repeat)) * 1000
+
+    def measure_size(self, size, options):
+        user = self.seed(size, options['batch_size'])
+        ids = Note.objects.filter(author=user).order_by('id').values_list(
+            'id', flat=True
+        )
+        middle, last = ids[size // 2], ids[max(size - 2, 0)]
+        repeat = options['repeat']
+        first_ms = self.median_ms(lambda: self.render_page(user), repeat)
+        middle_ms = self.median_ms(
+            lambda: self.render_page(user, middle), repeat
+        )
+        last_ms = self.median_ms(lambda: self.render_page(user, last), repeat)
+        full = '—'
+        if size <= options['full_limit']:
+            start = time.perf_counter()
+            list(Note.objects.filter(author=user))
+            full = f'{(time.perf_counter() - start) * 1000:.1f}'
+        self.stdout.write(
+            f'{size:>9} {first_ms:>11.2f} {middle_ms:>13.2f} '
+            f'{last_ms:>14.2f} {full:>16}'
+        )
+        if options['verbosity'] > 1:
+            self.explain(user, middle)
+
+    def explain(self, user, after):
+        queryset = Note.objects.filter(author=user, id__gt=after).order_by(
+            'id'
+        )[:100]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            for row in cursor.fetchall():
+                self.stdout.write(f'  {row[-1]}')
@@ -0,0 +1,107 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes import search
+from notes.models import Note
+
+User = get_user_model()
+
+ALPHABET = 'абвгдежзиклмнопрстуфхцчшэюя'
+
+
+class Rollback(Exception):
+    """Откатываем тестовые данные после замеров."""
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку поиска по заметкам пользователя с заданным '
+        'числом заметок, в том числе по префиксам при наборе. Данные '
+        'создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Поиск работает только на SQLite.')
+        rng = random.Random(options['seed'])
+        vocabulary = [
+            ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 10)))
+            for _ in range(options['vocabulary'])
+        ]
+        # Распределение, близкое к закону Ципфа: частые слова в начале.
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(vocabulary))
+        ))
+        try:
+            with transaction.atomic():
+                user = self.seed(rng, vocabulary, weights, options)
+                self.measure(rng, vocabulary, user, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rng, vocabulary, weights, options):
+        start = time.perf_counter()
+        count, batch_size = options['count'], options['batch_size']
+        user = User.objects.create(username='bench-search')
+
+        def words(k):
+            return ' '.join(rng.choices(vocabulary, cum_weights=weights, k=k))
+
+        for offset in range(0, count, batch_size):
+            Note.objects.bulk_create(
+                Note(
+                    title=words(4),
+                    text=words(40),
+                    slug=f'bench-search-{number}',
+                    author=user,
+                )
+                for number in range(offset, min(count, offset + batch_size))
+            )
+        self.stdout.write(
+            f'Создано заметок: {count} за {time.perf_counter() - start:.1f} с'
+        )
+        return user
+
+    def measure(self, rng, vocabulary, user, options):
+        cases = {
+            'частое слово': lambda: vocabulary[rng.randint(0, 9)],
+            'среднее слово': lambda: vocabulary[rng.randint(100, 1000)],
+            'редкое слово': lambda: rng.choice(vocabulary[10000:]),
+            'два слова': lambda: ' '.join(rng.sample(vocabulary[:1000], 2)),
+            # Поиск по мере набора: каждый префикс слова от двух букв.
+            'набор слова': lambda: rng.choice(vocabulary[:1000])[
+                :rng.randint(search.MIN_PREFIX, search.MAX_INDEXED_PREFIX)
+            ],
+            'длинный префикс': lambda: rng.choice(vocabulary[:1000])[
+                :search.MAX_INDEXED_PREFIX + 1
+            ],
+        }
+        for name, make_query in cases.items():
+            timings = []
+            for _ in range(options['queries']):
+                query = make_query()
+                start = time.perf_counter()
+                search.search(query, user.pk)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name}: p50 {percentile(timings, 0.5) * 1000:.2f} мс, '
+                f'p95 {percentile(timings, 0.95) * 1000:.2f} мс'
+            )
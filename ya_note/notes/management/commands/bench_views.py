@@ -0,0 +1,213 @@
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.models import Note
+
+SIZES = (1000, 10_000, 100_000, 1_000_000)
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_kb')
+# p99 из нескольких десятков замеров — это почти максимум, он слишком
+# шумный, чтобы по нему находить регрессии.
+COMPARED = ('p50_ms', 'p95_ms', 'queries', 'peak_kb')
+
+# Строки с номерами из [start, stop) одним запросом: в несколько раз
+# быстрее bulk_create, которому нужен объект модели на каждую строку.
+GENERATE_SQL = """
+    INSERT INTO {table} ({columns})
+    WITH RECURSIVE seq(i) AS (
+        SELECT %s UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < %s
+    )
+    SELECT {values} FROM seq
+"""
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def generate(model, start, stop, **values):
+    """
+    Строки ``model`` с номерами от ``start`` до ``stop``.
+
+    Значения полей — выражения SQL от номера строки ``i``.
+    """
+    if start >= stop:
+        return
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in values]
+    sql = GENERATE_SQL.format(
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(column) for column in columns),
+        # Знак % в выражениях — остаток от деления, а не параметр.
+        values=', '.join(
+            value.replace('%', '%%') for value in values.values()
+        ),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [start, stop])
+
+
+def compare(report, baseline, tolerance):
+    """Замеры, которые хуже сохранённых больше чем на ``tolerance``."""
+    regressions = []
+    for size, routes in report['results'].items():
+        for route, metrics in routes.items():
+            saved = baseline.get('results', {}).get(size, {}).get(route)
+            if not saved:
+                continue
+            for metric in COMPARED:
+                # Число запросов не должно расти вовсе.
+                limit = saved[metric] if metric == 'queries' else (
+                    saved[metric] * (1 + tolerance)
+                )
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f'{size} {route} {metric}: '
+                        f'{saved[metric]} -> {metrics[metric]}'
+                    )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет, как растут задержка, число запросов и память '
+        'страниц заметок с ростом числа заметок пользователя. Данные '
+        'создаются во временной БД SQLite. Отчёт пишется в JSON и может '
+        'сравниваться с сохранённым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Куда записать отчёт JSON.')
+        parser.add_argument(
+            '--baseline', help='Отчёт JSON, с которым сравнить замеры.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост задержки и памяти, доля от базовых.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замеры работают только на SQLite.')
+        with tempfile.TemporaryDirectory() as directory:
+            test_settings = connection.settings_dict['TEST']
+            test_settings['NAME'] = str(Path(directory) / 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps(report, ensure_ascii=False, indent=2)
+            )
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(report, baseline, options['tolerance'])
+            for line in regressions:
+                self.stderr.write(f'Регрессия: {line}')
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def run(self, options):
+        user = get_user_model().objects.create(username='bench')
+        client = Client()
+        client.force_login(user)
+        report = {
+            'project': 'ya_note',
+            'created': timezone.now().isoformat(),
+            'repeat': options['repeat'],
+            'results': {},
+        }
+        self.stdout.write(
+            f'{"размер":>9} {"страница":<18} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"p99, мс":>9} {"запросов":>9} '
+            f'{"память, КБ":>11}'
+        )
+        size = 0
+        for target in sorted(options['sizes']):
+            self.grow(size, target, user)
+            size = target
+            results = report['results'][str(size)] = {}
+            for route, url in self.cases(size, user).items():
+                result = results[route] = self.measure(
+                    client, url, options['repeat']
+                )
+                self.stdout.write(
+                    f'{size:>9} {route:<18} {result["p50_ms"]:>9.2f} '
+                    f'{result["p95_ms"]:>9.2f} {result["p99_ms"]:>9.2f} '
+                    f'{result["queries"]:>9} {result["peak_kb"]:>11.1f}'
+                )
+        return report
+
+    def grow(self, size, target, user):
+        """Добавляем заметки пользователю, пока их не станет ``target``."""
+        start = time.perf_counter()
+        generate(
+            Note, size, target,
+            title="'Заметка ' || i",
+            text="'Текст заметки ' || i",
+            slug="'bench-' || i",
+            author=str(user.pk),
+            modified="datetime('now')",
+        )
+        self.stdout.write(
+            f'Создано заметок: {target} '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
+
+    def cases(self, size, user):
+        """Адреса для замеров; ключ — имя URL и вариант страницы."""
+        middle = Note.objects.filter(author=user).order_by('id').values_list(
+            'id', 'slug'
+        )[size // 2]
+        notes_list = reverse('notes:list')
+        return {
+            'notes:list': notes_list,
+            'notes:list?after': f'{notes_list}?after={middle[0]}',
+            'notes:detail': reverse('notes:detail', args=(middle[1],)),
+        }
+
+    def measure(self, client, url, repeat):
+        """Задержка, число запросов и пик памяти Python на один запрос."""
+        client.get(url)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, (url, response.status_code)
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        # Следующий запрос к сайту очистит журнал, из которого читает
+        # captured_queries.
+        queries = len(context.captured_queries)
+        tracemalloc.start()
+        try:
+            client.get(url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'queries': queries,
+            'peak_kb': round(peak / 1024, 1),
+        }
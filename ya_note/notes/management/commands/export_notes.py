@@ -0,0 +1,71 @@
+import csv
+import json
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+
+FORMATS = ('ndjson', 'csv')
+FIELDS = ('title', 'text', 'slug', 'author')
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает заметки в NDJSON или CSV в формате import_notes. '
+        'Заметки читаются из БД пачками, так что память не растёт '
+        'с их числом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Путь к файлу или «-» для stdout.',
+        )
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--author', help='Только заметки этого автора.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        notes = Note.objects.order_by('id').values_list(
+            'title', 'text', 'slug', 'author__username'
+        )
+        if options['author']:
+            notes = notes.filter(author__username=options['author'])
+        start = time.perf_counter()
+        if path == '-':
+            stream = nullcontext(self.stdout)
+        else:
+            stream = open(path, 'w', encoding='utf-8', newline='')
+        with stream as output:
+            exported = self.write(
+                output, file_format, notes.iterator(options['chunk_size'])
+            )
+        elapsed = time.perf_counter() - start
+        # Отчёт в stderr, чтобы не смешивать его с выгрузкой в stdout.
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено заметок: {exported} за {elapsed:.1f} с '
+            f'({exported / elapsed:.0f} заметок/с)'
+        ))
+
+    def write(self, output, file_format, rows):
+        exported = 0
+        if file_format == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                exported += 1
+            return exported
+        for row in rows:
+            output.write(
+                json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False)
+                + '\n'
+            )
+            exported += 1
+        return exported
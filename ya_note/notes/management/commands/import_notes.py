@@ -0,0 +1,183 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import IntegrityError, reset_queries, transaction
+
+from notes import slugs
+from notes.models import SLUG_ATTEMPTS, Note
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+TITLE_LENGTH = Note._meta.get_field('title').max_length
+DEFAULT_TITLE = Note._meta.get_field('title').default
+
+
+def is_slug(value):
+    """Пустая строка или slug, который примет поле модели."""
+    if not isinstance(value, str) or len(value) > slugs.MAX_LENGTH:
+        return False
+    try:
+        validate_slug(value)
+    except ValidationError:
+        return not value
+    return True
+
+
+def read_rows(stream, file_format):
+    """Построчно читаем записи, не загружая файл целиком."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует заметки из NDJSON или CSV с полями title, text, '
+        'slug (необязательно) и author (имя пользователя). Slug для '
+        'всей пачки подбирается в памяти, занятые проверяются одним '
+        'запросом на пачку. Записи с занятым явным slug, пустым '
+        'текстом или неизвестным автором пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или «-» для stdin.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--author',
+            help='Автор для всех заметок вместо поля author.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        self.default_author = options['author']
+        self.rejected = Counter()
+        self.imported = 0
+        start = time.perf_counter()
+        if path == '-':
+            self.import_stream(sys.stdin, file_format, options['batch_size'])
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                self.import_stream(
+                    stream, file_format, options['batch_size']
+                )
+        elapsed = time.perf_counter() - start
+        total = self.imported + sum(self.rejected.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {total}, импортировано: {self.imported}, '
+            f'отклонено: {sum(self.rejected.values())} '
+            f'за {elapsed:.1f} с ({total / elapsed:.0f} записей/с)'
+        ))
+        for reason, count in self.rejected.most_common():
+            self.stdout.write(f'  {reason}: {count}')
+
+    def import_stream(self, stream, file_format, batch_size):
+        try:
+            for chunk in chunks(read_rows(stream, file_format), batch_size):
+                self.import_chunk(chunk)
+        except (ValueError, csv.Error) as error:
+            raise CommandError(
+                f'Не удалось разобрать запись после {self.imported} '
+                f'импортированных: {error}'
+            )
+
+    def import_chunk(self, rows):
+        """Одна выборка авторов, одна — slug и одна вставка на пачку."""
+        rows = [row for row in rows if self.is_valid(row)]
+        usernames = {self.author_name(row) for row in rows}
+        authors = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'pk'))
+        notes = []
+        for row in rows:
+            author_id = authors.get(self.author_name(row))
+            if author_id is None:
+                self.rejected['автор не найден'] += 1
+                continue
+            note = Note(
+                title=row.get('title') or DEFAULT_TITLE,
+                text=row['text'],
+                author_id=author_id,
+            )
+            note.requested_slug = row.get('slug') or ''
+            notes.append(note)
+        for attempt in range(SLUG_ATTEMPTS):
+            accepted = self.assign_slugs(notes)
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create(accepted)
+                break
+            except IntegrityError:
+                # Slug занял параллельный запрос: подбираем заново.
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
+        if len(accepted) < len(notes):
+            self.rejected['slug занят'] += len(notes) - len(accepted)
+        self.imported += len(accepted)
+        # При DEBUG=True Django копит SQL всех запросов.
+        reset_queries()
+
+    def assign_slugs(self, notes):
+        """
+        Раздаём slug всей пачке по одному запросу к БД.
+
+        Явный slug сохраняется, если свободен, иначе заметка
+        пропускается. Пустой подбирается из заголовка с суффиксом.
+        """
+        bases = [
+            note.requested_slug or slugs.base_slug(note.title)
+            for note in notes
+        ]
+        batch = slugs.BatchSlugs(Note, bases)
+        accepted = []
+        for note, base in zip(notes, bases):
+            if note.requested_slug and batch.is_taken(base):
+                continue
+            note.slug = batch.allocate(base)
+            accepted.append(note)
+        return accepted
+
+    def author_name(self, row):
+        return self.default_author or row.get('author')
+
+    def is_valid(self, row):
+        reason = None
+        if not isinstance(row, dict):
+            reason = 'запись не объект'
+        elif not row.get('text') or not isinstance(row['text'], str):
+            reason = 'пустой текст'
+        elif not isinstance(row.get('title') or '', str):
+            reason = 'заголовок не строка'
+        elif len(row.get('title') or '') > TITLE_LENGTH:
+            reason = 'слишком длинный заголовок'
+        elif not is_slug(row.get('slug') or ''):
+            reason = 'некорректный slug'
+        elif not isinstance(self.author_name(row), str):
+            reason = 'автор не найден'
+        if reason:
+            self.rejected[reason] += 1
+        return reason is None
@@ -0,0 +1,391 @@
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application,
+)
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from notes.models import Note
+
+KINDS = ('anonymous', 'user', 'write')
+MIX = 'anonymous=60,user=30,write=10'
+
+# Маршрут — имя URL и вид запросов; адрес выбирается случайно из paths,
+# data — тело формы для POST.
+Route = namedtuple('Route', 'kind name method paths data')
+Job = namedtuple(
+    'Job', 'transport address routes weights session form_path requests seed'
+)
+
+# Ошибки «database is locked» по маршрутам: SQLite не дождался снятия
+# блокировки записи за OPTIONS['timeout'] секунд. Считаются в том
+# процессе, где работает приложение.
+LOCK_ERRORS = Counter()
+LOCK_ERRORS_LOCK = threading.Lock()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def parse_mix(value):
+    """Доли видов запросов: ``anonymous=60,user=30,write=10``."""
+    weights = dict.fromkeys(KINDS, 0)
+    try:
+        for part in value.split(','):
+            kind, weight = part.split('=')
+            if kind not in weights or int(weight) < 0:
+                raise ValueError(part)
+            weights[kind] = int(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'Ожидается вид=доля через запятую, виды: {", ".join(KINDS)}'
+        )
+    if not sum(weights.values()):
+        raise argparse.ArgumentTypeError('Все доли нулевые')
+    return weights
+
+
+def label(kind, name):
+    return f'{kind} {name}'
+
+
+def count_lock_error(sender, request=None, **kwargs):
+    """Обработчик got_request_exception: считаем ожидания блокировки."""
+    error = sys.exc_info()[1]
+    if not isinstance(error, OperationalError) or 'locked' not in str(error):
+        return
+    user = getattr(request, 'user', None)
+    if request.method == 'POST':
+        kind = 'write'
+    elif user is not None and user.is_authenticated:
+        kind = 'user'
+    else:
+        kind = 'anonymous'
+    match = request.resolver_match
+    with LOCK_ERRORS_LOCK:
+        LOCK_ERRORS[label(kind, match.view_name if match else '?')] += 1
+
+
+class InProcess:
+    """Вызывает WSGI-приложение проекта напрямую, без сокета."""
+
+    def __init__(self, address=None):
+        self.application = get_internal_wsgi_application()
+
+    def request(self, method, path, headers, body):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            if key != 'CONTENT_TYPE':
+                key = f'HTTP_{key}'
+            environ[key] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = response_headers
+
+        response = self.application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return started['status'], started['headers']
+
+
+class OverSocket:
+    """Ходит к приложению по HTTP через локальный сокет."""
+
+    def __init__(self, address):
+        self.address = address
+
+    def request(self, method, path, headers, body):
+        http_connection = http.client.HTTPConnection(*self.address)
+        try:
+            http_connection.request(method, path, body, headers)
+            response = http_connection.getresponse()
+            response.read()
+            return response.status, response.getheaders()
+        finally:
+            http_connection.close()
+
+
+TRANSPORTS = {'inprocess': InProcess, 'socket': OverSocket}
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Без строки в журнале на каждый запрос."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Visitor:
+    """Посетитель со своими cookie, как браузер."""
+
+    def __init__(self, transport, session=None):
+        self.transport = transport
+        self.cookies = {}
+        if session:
+            self.cookies[settings.SESSION_COOKIE_NAME] = session
+
+    def send(self, method, path, data=None):
+        headers = {'Host': 'localhost'}
+        body = b''
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            # Токен из cookie, которую выдала страница с формой.
+            headers['X-CSRFToken'] = self.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+        status, response_headers = self.transport.request(
+            method, path, headers, body
+        )
+        for name, value in response_headers:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+        return status
+
+
+def run_job(job):
+    """
+    Запросы одного потока или процесса.
+
+    Возвращает список (маршрут, статус, секунды) и ошибки блокировки,
+    которые приложение этого процесса насчитало за время работы.
+    """
+    before = Counter(LOCK_ERRORS)
+    transport = TRANSPORTS[job.transport](job.address)
+    generator = random.Random(job.seed)
+    anonymous = Visitor(transport)
+    user = Visitor(transport, job.session)
+    # Страница с формой выдаёт cookie с токеном CSRF для записи.
+    user.send('GET', job.form_path)
+    kinds = [kind for kind in KINDS if job.weights[kind]]
+    weights = [job.weights[kind] for kind in kinds]
+    routes = defaultdict(list)
+    for route in job.routes:
+        routes[route.kind].append(route)
+    results = []
+    for _ in range(job.requests):
+        route = generator.choice(routes[generator.choices(kinds, weights)[0]])
+        visitor = anonymous if route.kind == 'anonymous' else user
+        path = generator.choice(route.paths)
+        start = time.perf_counter()
+        status = visitor.send(route.method, path, route.data)
+        results.append(
+            (label(route.kind, route.name), status,
+             time.perf_counter() - start)
+        )
+    return results, LOCK_ERRORS - before
+
+
+def seed(notes_count, users):
+    """Пользователи с заметками; ключ сессии и маршруты каждого."""
+    visitors = []
+    for number in range(users):
+        user = get_user_model().objects.create(username=f'loadtest-{number}')
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {i}',
+                text=f'Текст заметки {i}',
+                slug=f'loadtest-{number}-{i}',
+                author=user,
+            ) for i in range(notes_count)
+        )
+        client = Client()
+        client.force_login(user)
+        visitors.append(
+            (client.cookies[settings.SESSION_COOKIE_NAME].value, routes(user))
+        )
+    return visitors
+
+
+def routes(user):
+    """Маршруты посетителя: читает он только свои заметки."""
+    details = [
+        reverse('notes:detail', args=(slug,))
+        for slug in Note.objects.filter(author=user).values_list(
+            'slug', flat=True
+        )
+    ]
+    return [
+        Route('anonymous', 'notes:home', 'GET', [reverse('notes:home')], None),
+        Route('user', 'notes:list', 'GET', [reverse('notes:list')], None),
+        Route('user', 'notes:detail', 'GET', details, None),
+        # Slug подбирается из заголовка, как при обычном добавлении.
+        Route(
+            'write', 'notes:add', 'POST', [reverse('notes:add')],
+            {'title': 'Заметка под нагрузкой', 'text': 'Текст', 'slug': ''},
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает WSGI-приложение проекта смесью чтений анонимов и '
+        'вошедших пользователей и добавления заметок из пула потоков '
+        'или процессов. Приложение вызывается в процессе или через '
+        'локальный сокет, на временной БД SQLite. Печатает запросы в '
+        'секунду, p50/p95/p99 и ошибки блокировки SQLite по маршрутам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transport', choices=TRANSPORTS, default='inprocess'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread'
+        )
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--mix', type=parse_mix, default=parse_mix(MIX),
+            help=f'Доли видов запросов, по умолчанию {MIX}.',
+        )
+        parser.add_argument('--notes', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Нагрузка работает только на SQLite.')
+        got_request_exception.connect(count_lock_error)
+        with tempfile.TemporaryDirectory() as directory:
+            test_settings = connection.settings_dict['TEST']
+            test_settings['NAME'] = str(Path(directory) / 'load.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.run(options)
+            finally:
+                got_request_exception.disconnect(count_lock_error)
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        jobs = self.jobs(
+            options, seed(options['notes'], options['workers'])
+        )
+        # Соединения с БД не должны достаться дочерним процессам.
+        connections.close_all()
+        server = None
+        if options['transport'] == 'socket':
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+            server.set_app(get_internal_wsgi_application())
+            jobs = [job._replace(address=server.server_address)
+                    for job in jobs]
+        with self.executor(options) as executor:
+            if server:
+                threading.Thread(target=server.serve_forever,
+                                 daemon=True).start()
+            start = time.perf_counter()
+            outcomes = list(executor.map(run_job, jobs))
+            elapsed = time.perf_counter() - start
+        if server:
+            server.shutdown()
+            server.server_close()
+        self.report(outcomes, elapsed, options['pool'])
+
+    def jobs(self, options, visitors):
+        workers = options['workers']
+        return [
+            Job(
+                transport=options['transport'],
+                address=None,
+                routes=visitor_routes,
+                weights=options['mix'],
+                session=session,
+                form_path=reverse('notes:add'),
+                # Остаток делится между первыми исполнителями.
+                requests=(
+                    options['requests'] // workers
+                    + (number < options['requests'] % workers)
+                ),
+                seed=options['seed'] + number,
+            )
+            for number, (session, visitor_routes) in enumerate(visitors)
+        ]
+
+    def executor(self, options):
+        if options['pool'] == 'thread':
+            return ThreadPoolExecutor(options['workers'])
+        executor = ProcessPoolExecutor(
+            options['workers'], mp_context=get_context('fork')
+        )
+        # Процессы создаются сразу, до потока сервера: fork копирует
+        # только вызывающий поток.
+        executor.submit(os.getpid).result()
+        return executor
+
+    def report(self, outcomes, elapsed, pool):
+        timings = defaultdict(list)
+        errors = Counter()
+        for results, _ in outcomes:
+            for route, status, seconds in results:
+                timings[route].append(seconds)
+                errors[route] += status >= 400
+        locks = Counter(LOCK_ERRORS)
+        if pool == 'process':
+            for _, job_locks in outcomes:
+                locks.update(job_locks)
+        self.stdout.write(
+            f'{"маршрут":<22} {"запросов":>9} {"запр/с":>8} '
+            f'{"ошибок":>7} {"блокировок":>11} {"p50, мс":>8} '
+            f'{"p95, мс":>8} {"p99, мс":>8}'
+        )
+        everything = []
+        for route in sorted(timings):
+            everything.extend(timings[route])
+            self.write_row(route, timings[route], elapsed,
+                           errors[route], locks[route])
+        self.write_row('всего', everything, elapsed,
+                       sum(errors.values()), sum(locks.values()))
+
+    def write_row(self, route, timings, elapsed, errors, locks):
+        self.stdout.write(
+            f'{route:<22} {len(timings):>9} {len(timings) / elapsed:>8.1f} '
+            f'{errors:>7} {locks:>11} '
+            f'{percentile(timings, 0.50) * 1000:>8.2f} '
+            f'{percentile(timings, 0.95) * 1000:>8.2f} '
+            f'{percentile(timings, 0.99) * 1000:>8.2f}'
+        )
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from notes.search import FTS_TABLE, TRIGGERS_SQL
+from notes.sqlite import run_on_sqlite
+
+CREATE_SQL = (
+    # Индекс префиксов ускоряет поиск по мере набора.
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, text, author_id,
+        content='notes_note',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    *TRIGGERS_SQL,
+    # Заполняем индекс уже существующими заметками.
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+DROP_SQL = (
+    'DROP TRIGGER IF EXISTS notes_note_fts_insert',
+    'DROP TRIGGER IF EXISTS notes_note_fts_delete',
+    'DROP TRIGGER IF EXISTS notes_note_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+from notes.api import TRIGGERS_SQL, VERSION_TABLE
+from notes.sqlite import run_on_sqlite
+
+CREATE_SQL = (
+    # Версия набора заметок автора для ETag в API. Внешнего ключа нет:
+    # строка удалённого пользователя ничему не мешает, а каскадное
+    # удаление заметок пересоздавало бы её.
+    f"""
+    CREATE TABLE {VERSION_TABLE} (
+        author_id integer NOT NULL PRIMARY KEY,
+        version integer NOT NULL
+    )
+    """,
+    *TRIGGERS_SQL,
+)
+
+DROP_SQL = (
+    'DROP TRIGGER IF EXISTS notes_note_version_insert',
+    'DROP TRIGGER IF EXISTS notes_note_version_delete',
+    'DROP TRIGGER IF EXISTS notes_note_version_update',
+    f'DROP TABLE IF EXISTS {VERSION_TABLE}',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)
+        ),
+    ]
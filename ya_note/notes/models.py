@@ -1,7 +1,10 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router
 
-from pytils.translit import slugify
+from . import slugs
+from .sqlite import immediate_atomic
+
+SLUG_ATTEMPTS = 3
 
 
 class Note(models.Model):
@@ -17,7 +20,7 @@ class Note(models.Model):
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=slugs.MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
@@ -26,13 +29,51 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Отдельный индекс не нужен: его заменяет составной из Meta.
+        db_index=False,
     )
+    # bulk_update не заполняет auto_now: там время ставится явно.
+    modified = models.DateTimeField('Изменена', auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Сохраняем заметку, подбирая свободный slug, если он не задан.
+
+        Запись идёт в транзакции, которая на SQLite сразу берёт
+        блокировку записи (см. ``immediate_atomic``). Поэтому slug
+        подбирается уже под блокировкой, и параллельная вставка не может
+        его занять. На других СУБД такое возможно: тогда база отклонит
+        вставку по уникальности, и мы подберём slug заново.
+        """
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        if self.slug:
+            with immediate_atomic(using):
+                return super().save(*args, **kwargs)
+        others = type(self)._default_manager.using(using).exclude(pk=self.pk)
+        for attempt in range(SLUG_ATTEMPTS):
+            try:
+                with immediate_atomic(using):
+                    self.slug = slugs.allocate(others, self.title)
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SLUG_ATTEMPTS - 1:
+                    self.slug = ''
+                    raise
+
+    def delete(self, *args, **kwargs):
+        """Удаление меняет индекс поиска, поэтому тоже под блокировкой."""
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with immediate_atomic(using):
+            return super().delete(*args, **kwargs)
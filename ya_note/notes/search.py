@@ -0,0 +1,238 @@
+"""
+Полнотекстовый поиск по заметкам пользователя на SQLite FTS5.
+
+Индекс ``notes_note_fts`` хранит только токены (external content) и
+поддерживается триггерами на ``notes_note``, поэтому учитывает
+``bulk_create``, ``NoteUpdate``, ``NoteDelete`` и изменения из
+админки. Id автора индексируется как отдельная колонка.
+
+bm25 для каждого слова считает по всему индексу число документов с
+ним, и на миллионе заметок частое слово обходится в десятки
+миллисекунд. Поэтому ранжируем окно из последних
+``NOTES_SEARCH_CANDIDATES`` совпадений автора в Python: чем больше
+слов запроса в заголовке, тем выше, при равенстве — новее. Подсветка
+тоже считается в Python и только для выбранной страницы.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+from .sqlite import trigger_installer
+
+FTS_TABLE = 'notes_note_fts'
+
+TRIGGERS_SQL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_note_fts_insert
+    AFTER INSERT ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, text, author_id)
+        VALUES (new.id, new.title, new.text, new.author_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_note_fts_delete
+    AFTER DELETE ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, author_id)
+        VALUES ('delete', old.id, old.title, old.text, old.author_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_note_fts_update
+    AFTER UPDATE OF title, text, author_id ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, author_id)
+        VALUES ('delete', old.id, old.title, old.text, old.author_id);
+        INSERT INTO {FTS_TABLE}(rowid, title, text, author_id)
+        VALUES (new.id, new.title, new.text, new.author_id);
+    END
+    """,
+)
+
+install_triggers = trigger_installer(FTS_TABLE, TRIGGERS_SQL)
+
+# Порядок по rowid FTS5 отдаёт без сортировки и останавливается на
+# LIMIT, не дочитывая списки документов. Окно SQLite материализует
+# в том же порядке, от новых к старым.
+RECENT_SQL = f"""
+    SELECT notes_note.id, notes_note.title
+    FROM (
+        SELECT rowid FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rowid DESC
+        LIMIT %s
+    ) AS found
+    JOIN notes_note ON notes_note.id = found.rowid
+    WHERE notes_note.author_id = %s
+    LIMIT %s
+"""
+
+WINDOW_SIZE_SQL = f"""
+    SELECT count(*) FROM (
+        SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s
+    )
+"""
+
+CANDIDATES_SQL = f"""
+    SELECT notes_note.id, notes_note.title
+    FROM {FTS_TABLE}
+    JOIN notes_note ON notes_note.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY {FTS_TABLE}.rowid DESC
+    LIMIT %s
+"""
+
+WORD_EXISTS_SQL = f"""
+    SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT 1
+"""
+
+# Префикс из одной буквы раскрывается в слишком много слов, а индекс
+# префиксов в миграции построен для длин от двух до четырёх символов.
+# Более длинный префикс FTS5 собирает, читая целиком списки документов
+# всех подходящих слов, и частое слово обходится в десятки
+# миллисекунд. Поэтому сначала проверяем, не допечатано ли слово.
+MIN_PREFIX = 2
+MAX_INDEXED_PREFIX = 4
+# Сколько последних совпадений всех авторов просматривать, прежде чем
+# спрашивать FTS5 с условием на автора.
+RECENT_WINDOW = 1000
+# Сколько символов текста показывать вокруг первого совпадения.
+SNIPPET_BEFORE = 60
+SNIPPET_LENGTH = 200
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def parse_query(query):
+    """
+    Слова запроса и признак того, что последнее ещё печатается.
+
+    Такое слово ищется как префикс.
+    """
+    words = re.findall(r'\w+', query)
+    prefix = bool(words) and (
+        len(words[-1]) >= MIN_PREFIX and not query[-1].isspace()
+    )
+    return words, prefix
+
+
+def build_match(words, prefix, author_id=None):
+    """
+    Выражение FTS5 для слов запроса.
+
+    Каждое слово берём в кавычки, чтобы символы синтаксиса FTS5
+    в запросе не приводили к ошибкам; слова объединяются через AND.
+    """
+    phrases = [f'"{word}"' for word in words]
+    if prefix:
+        phrases[-1] += '*'
+    match = f'{{title text}} : ({" ".join(phrases)})'
+    if author_id is None:
+        return match
+    return f'author_id : "{author_id}" AND {match}'
+
+
+def is_complete_word(cursor, word):
+    """Есть ли слово в индексе целиком: такой запрос не читает списки."""
+    cursor.execute(WORD_EXISTS_SQL, [f'"{word}"'])
+    return cursor.fetchone() is not None
+
+
+def find_candidates(cursor, words, prefix, author_id):
+    """
+    Id и заголовки последних совпадений автора.
+
+    Условие на автора FTS5 выполняет, обходя список всех его заметок,
+    и у автора с миллионом заметок редкое сочетание слов стоит
+    десятки миллисекунд. Поэтому сначала просматриваем последние
+    совпадения всех авторов и отбираем свои соединением с таблицей
+    заметок. Если своих там мало, а совпадений больше окна, значит,
+    заметок автора немного, и условие на автора в FTS5 дешёво.
+    """
+    limit = settings.NOTES_SEARCH_CANDIDATES
+    match = build_match(words, prefix)
+    cursor.execute(RECENT_SQL, [match, RECENT_WINDOW, author_id, limit])
+    candidates = cursor.fetchall()
+    if len(candidates) == limit:
+        return candidates
+    cursor.execute(WINDOW_SIZE_SQL, [match, RECENT_WINDOW])
+    if cursor.fetchone()[0] < RECENT_WINDOW:
+        return candidates
+    cursor.execute(CANDIDATES_SQL, [
+        build_match(words, prefix, author_id), limit
+    ])
+    return cursor.fetchall()
+
+
+def words_pattern(words, prefix):
+    alternatives = [re.escape(word) + r'\b' for word in words]
+    if prefix:
+        alternatives[-1] = re.escape(words[-1])
+    return re.compile(
+        r'\b(?:' + '|'.join(alternatives) + ')', re.IGNORECASE
+    )
+
+
+def highlighted(text, pattern):
+    """Экранируем текст и выделяем найденные слова тегом ``<mark>``."""
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
+
+
+def snippet(text, pattern):
+    """Фрагмент текста вокруг первого совпадения."""
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_BEFORE) if match else 0
+    fragment = text[start:start + SNIPPET_LENGTH]
+    if start:
+        fragment = '…' + fragment
+    if start + SNIPPET_LENGTH < len(text):
+        fragment += '…'
+    return highlighted(fragment, pattern)
+
+
+def search(query, author_id, limit=None):
+    """Самые релевантные заметки автора."""
+    words, prefix = parse_query(query)
+    if not words:
+        return []
+    with connection.cursor() as cursor:
+        if (
+            prefix and len(words[-1]) > MAX_INDEXED_PREFIX
+            and is_complete_word(cursor, words[-1])
+        ):
+            prefix = False
+        candidates = find_candidates(cursor, words, prefix, author_id)
+    if not candidates:
+        return []
+    pattern = words_pattern(words, prefix)
+    # Сортировка устойчива: при равенстве новые заметки выше.
+    candidates.sort(key=lambda row: row[0], reverse=True)
+    candidates.sort(
+        key=lambda row: len(set(pattern.findall(row[1].lower()))),
+        reverse=True,
+    )
+    page = candidates[:limit or settings.NOTES_SEARCH_LIMIT]
+    notes = dict(
+        (pk, (slug, text)) for pk, slug, text in Note.objects.filter(
+            pk__in=[pk for pk, _ in page]
+        ).values_list('pk', 'slug', 'text')
+    )
+    return [
+        {
+            'slug': notes[pk][0],
+            'title': highlighted(title, pattern),
+            'snippet': snippet(notes[pk][1], pattern),
+        }
+        for pk, title in page
+    ]
@@ -0,0 +1,185 @@
+"""
+Выделение slug для заметок.
+
+Транслитерация заголовка кешируется. Занятые варианты ``base``,
+``base-2``, ``base-3``… целиком не выбираются: один запрос по
+диапазонам уникального индекса возвращает только то, занят ли сам
+``base``, и наибольший занятый N. Новой заметке достаётся ``base``
+или ``base-(N+1)``; пропуски в нумерации не заполняются. Между
+выбором и вставкой slug может занять параллельный запрос, поэтому
+``Note.save`` при нарушении уникальности повторяет попытку.
+"""
+import json
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import BigIntegerField, Case, Max, Min, Q, Value, When
+from django.db.models.functions import Cast, Substr
+from pytils.translit import slugify
+
+MAX_LENGTH = 100
+# Место под суффикс вида «-123456789».
+SUFFIX_ROOM = 10
+MAX_DIGITS = SUFFIX_ROOM - 1
+# Идёт сразу за «9» и не бывает в slug.
+AFTER_DIGITS = ':'
+DEFAULT_SLUG = 'note'
+# Для пачки диапазонов один запрос: OR из тысячи диапазонов SQLite не
+# разбирает, а соединение с json_each по-прежнему идёт по индексу.
+# Строка bound — из ``search_bounds``.
+NUMBERS_MANY_SQL = (
+    "SELECT json_extract(bound.value, '$[0]'), "
+    "MIN(CAST(substr(note.slug, json_extract(bound.value, '$[5]')) "
+    'AS INTEGER)), '
+    "MAX(CAST(substr(note.slug, json_extract(bound.value, '$[5]')) "
+    'AS INTEGER)) '
+    'FROM json_each(%s) AS bound '
+    'JOIN {table} AS note '
+    "ON note.slug BETWEEN json_extract(bound.value, '$[1]') "
+    "AND json_extract(bound.value, '$[2]') "
+    'AND length(note.slug) '
+    "BETWEEN json_extract(bound.value, '$[3]') "
+    "AND json_extract(bound.value, '$[4]') "
+    "WHERE substr(note.slug, json_extract(bound.value, '$[5]')) "
+    "NOT GLOB '*[^0-9]*' "
+    'GROUP BY 1'
+)
+
+
+@lru_cache(maxsize=4096)
+def base_slug(title):
+    """Транслитерированный заголовок, обрезанный до длины поля."""
+    return slugify(title)[:MAX_LENGTH] or DEFAULT_SLUG
+
+
+def variant(base, number):
+    """``base-N``: длинный base обрезается, чтобы суффикс поместился."""
+    suffix = f'-{number}'
+    return base[:MAX_LENGTH - len(suffix)] + suffix
+
+
+def search_bounds(base):
+    """
+    Где искать ``base`` и его варианты ``base-N`` в индексе по slug.
+
+    Строки ``(base, low, high, shortest, longest, start)``: slug между
+    ``low`` и ``high``, длиной от ``shortest`` до ``longest``, у
+    которого с позиции ``start`` одни цифры. Цифры с ``start`` —
+    это N, у самого ``base`` там пусто. Короткому base суффикс не
+    мешает, и все варианты начинаются с «base-». У длинного суффикс
+    вытесняет конец, и начало зависит от числа цифр.
+    """
+    bounds = [(base, base, base, len(base), len(base), len(base) + 1)]
+    digits_by_prefix = defaultdict(list)
+    for digits in range(1, MAX_DIGITS + 1):
+        digits_by_prefix[base[:MAX_LENGTH - 1 - digits]].append(digits)
+    for prefix, digits in digits_by_prefix.items():
+        bounds.append((
+            base,
+            # Без ведущих нулей: в «-0…» N не бывает.
+            f'{prefix}-1',
+            f'{prefix}-{AFTER_DIGITS}',
+            len(prefix) + 1 + min(digits),
+            len(prefix) + 1 + max(digits),
+            len(prefix) + 2,
+        ))
+    return bounds
+
+
+def numbers(queryset, base):
+    """
+    Занят ли ``base`` и наибольший занятый N среди ``base-N``.
+
+    Один запрос, который возвращает одну строку, сколько бы
+    вариантов ни было занято.
+    """
+    match = Q()
+    number = []
+    for _, low, high, shortest, longest, start in search_bounds(base)[1:]:
+        fewest, most = shortest - start + 1, longest - start + 1
+        bound = Q(
+            slug__range=(low, high),
+            slug__regex=rf'^.{{{start - 1}}}[0-9]{{{fewest},{most}}}$',
+        )
+        match |= bound
+        number.append(When(bound, then=Cast(
+            Substr('slug', start), BigIntegerField()
+        )))
+    number = Case(
+        When(slug=base, then=Value(0)), *number,
+        output_field=BigIntegerField(),
+    )
+    found = queryset.filter(
+        Q(slug=base) | match
+    ).aggregate(lowest=Min(number), highest=Max(number))
+    return found['lowest'] == 0, found['highest'] or 0
+
+
+def numbers_many(model, bases):
+    """``numbers`` для всех ``bases`` одним запросом."""
+    bounds = [
+        bound for base in sorted(set(bases)) for bound in search_bounds(base)
+    ]
+    if not bounds:
+        return {}
+    sql = NUMBERS_MANY_SQL.format(
+        table=connection.ops.quote_name(model._meta.db_table)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (json.dumps(bounds),))
+        return {
+            base: (lowest == 0, highest)
+            for base, lowest, highest in cursor.fetchall()
+        }
+
+
+def pick(base, taken, highest):
+    """``base``, если он свободен, иначе ``base-N`` за наибольшим."""
+    if not taken:
+        return base
+    return variant(base, max(highest, 1) + 1)
+
+
+def allocate(queryset, title):
+    """Свободный slug для заголовка: один запрос к БД."""
+    base = base_slug(title)
+    return pick(base, *numbers(queryset, base))
+
+
+class BatchSlugs:
+    """
+    Раздаёт slug целой пачке заметок по одному запросу к БД.
+
+    К занятому в БД добавляются slug, уже выданные пачке или явно
+    заданные в ней (``take``), а slug, которые пачка освобождает,
+    снова можно выдать.
+    """
+
+    def __init__(self, model, bases, released=()):
+        self.found = numbers_many(model, bases)
+        self.released = set(released)
+        self.taken = set()
+        # Наибольший выданный N по началу slug и числу цифр.
+        self.highest = defaultdict(int)
+
+    def is_taken(self, slug):
+        in_db = self.found.get(slug, (False, 0))[0]
+        return slug in self.taken or (in_db and slug not in self.released)
+
+    def take(self, slug):
+        self.taken.add(slug)
+        prefix, _, number = slug.rpartition('-')
+        if prefix and number.isdigit() and not number.startswith('0'):
+            key = (prefix, len(number))
+            self.highest[key] = max(self.highest[key], int(number))
+
+    def allocate(self, base):
+        highest = self.found.get(base, (False, 0))[1]
+        for _, _, _, shortest, longest, start in search_bounds(base)[1:]:
+            prefix = base[:start - 2]
+            for digits in range(shortest - start + 1, longest - start + 2):
+                highest = max(highest, self.highest[prefix, digits])
+        slug = pick(base, self.is_taken(base), highest)
+        self.take(slug)
+        return slug
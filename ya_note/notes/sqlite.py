@@ -0,0 +1,71 @@
+"""Особенности SQLite, общие для модулей приложения."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def _begin_immediate(connection):
+    connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+@contextmanager
+def immediate_atomic(using=DEFAULT_DB_ALIAS):
+    """
+    ``transaction.atomic``, который на SQLite начинается с BEGIN IMMEDIATE.
+
+    После обычного BEGIN блокировка записи берётся только на первой
+    записи. Если соединение к этому моменту уже читает базу, а запись
+    начало другое соединение, ждать нельзя — это взаимная блокировка,
+    и SQLite сразу отвечает «database is locked», не дожидаясь
+    timeout. Так падали параллельные вставки заметок с триггерами
+    FTS5. BEGIN IMMEDIATE берёт блокировку записи в начале транзакции,
+    и конкурирующие записи просто ждут друг друга.
+
+    Во вложенном блоке и на других СУБД это обычный ``atomic``.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # Django 3.2 не даёт выбрать вид BEGIN, поэтому подменяем метод,
+    # которым atomic начинает транзакцию, только у этого соединения
+    # и только на время входа в блок.
+    connection._start_transaction_under_autocommit = (
+        lambda: _begin_immediate(connection)
+    )
+    try:
+        with transaction.atomic(using=using):
+            del connection._start_transaction_under_autocommit
+            yield
+    finally:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
+
+
+def run_on_sqlite(statements):
+    """Операция ``RunPython``, которая выполняет SQL только на SQLite."""
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+def trigger_installer(table, triggers_sql):
+    """
+    Обработчик post_migrate, который возвращает триггеры ``table``.
+
+    Перестраивая таблицу, миграции SQLite удаляют её триггеры, а
+    ``triggers_sql`` создаёт их, только если их нет.
+    """
+    def install_triggers(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+        db = connections[using]
+        if db.vendor != 'sqlite' or table not in (
+            db.introspection.table_names()
+        ):
+            return
+        with db.cursor() as cursor:
+            for sql in triggers_sql:
+                cursor.execute(sql)
+    return install_triggers
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -31,8 +32,15 @@ class BaseTestCase(TestCase):
         cls.URL_LOGIN = reverse('users:login')
         cls.URL_LOGOUT = reverse('users:logout')
         cls.URL_LIST = reverse('notes:list')
+        cls.URL_SEARCH = reverse('notes:search')
+        cls.URL_EXPORT = reverse('notes:export')
+        cls.URL_API = reverse('notes:api')
         cls.URL_SUCCESS = reverse('notes:success')
         cls.URL_ADD = reverse('notes:add')
         cls.URL_DETAIL = reverse('notes:detail', args=(cls.note.slug,))
         cls.URL_EDIT = reverse('notes:edit', args=(cls.note.slug,))
         cls.URL_DELETE = reverse('notes:delete', args=(cls.note.slug,))
+
+    def setUp(self):
+        # Пользователи и сессии кешируются, а id между тестами повторяются.
+        cache.clear()
@@ -1,6 +1,15 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
 from .base_tests import BaseTestCase
 
+from notes import search
 from notes.forms import NoteForm
+from notes.models import Note
 
 
 class TestContent(BaseTestCase):
@@ -31,3 +40,117 @@ class TestContent(BaseTestCase):
                 response = self.author_client.get(url)
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
+
+    @override_settings(NOTES_PER_PAGE=2)
+    def test_notes_list_pagination(self):
+        """Список заметок выводится страницами по возрастанию id."""
+        Note.objects.bulk_create(
+            Note(title='Заметка', text='Текст', slug=f'page-{number}',
+                 author=self.author)
+            for number in range(4)
+        )
+        seen = []
+        response = self.author_client.get(self.URL_LIST)
+        while True:
+            page = list(response.context['object_list'])
+            self.assertLessEqual(len(page), 2)
+            seen.extend(note.id for note in page)
+            after = response.context.get('next_after')
+            if after is None:
+                break
+            response = self.author_client.get(self.URL_LIST, {'after': after})
+        self.assertEqual(seen, list(
+            Note.objects.filter(author=self.author).order_by('id')
+            .values_list('id', flat=True)
+        ))
+        response = self.author_client.get(self.URL_LIST, {'after': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_no_auth_queries_when_warm(self):
+        """
+        Прогретый запрос авторизованного пользователя не читает
+        сессию и пользователя из БД.
+        """
+        self.author_client.get(self.URL_LIST)
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(self.URL_LIST)
+        auth_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'auth_user' in query['sql'] or 'django_session' in query['sql']
+        ]
+        self.assertEqual(auth_queries, [])
+
+    def test_user_cache_invalidated_on_logout(self):
+        """После выхода пользователь больше не авторизован."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.URL_LIST)
+        client.get(self.URL_LOGOUT)
+        response = client.get(self.URL_LIST)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class TestSearch(BaseTestCase):
+    def search(self, query, client=None):
+        response = (client or self.author_client).get(
+            self.URL_SEARCH, {'q': query}
+        )
+        return response.context['results']
+
+    def test_search_ranked_highlighted_and_scoped(self):
+        """
+        Совпадение в заголовке выше совпадения в тексте, найденные
+        слова подсвечиваются, HTML экранируется, а чужие заметки
+        не находятся.
+        """
+        in_text = Note.objects.create(
+            title='Другое', text='<b>Комета</b> рядом', author=self.author
+        )
+        in_title = Note.objects.create(
+            title='Комета', text='Текст', author=self.author
+        )
+        Note.objects.create(
+            title='Комета', text='Текст', author=self.auth_user
+        )
+        results = self.search('комета')
+        self.assertEqual(
+            [result['slug'] for result in results],
+            [in_title.slug, in_text.slug],
+        )
+        self.assertEqual(results[0]['title'], '<mark>Комета</mark>')
+        self.assertIn(
+            '&lt;b&gt;<mark>Комета</mark>&lt;/b&gt;', results[1]['snippet']
+        )
+        self.assertEqual(len(self.search('комета', self.auth_user_client)), 1)
+
+    def test_search_falls_back_to_author_filter(self):
+        """
+        Если последние совпадения принадлежат другим авторам, заметки
+        автора находятся запросом с условием на автора.
+        """
+        own = Note.objects.create(
+            title='Комета', text='Текст', author=self.author
+        )
+        Note.objects.create(
+            title='Комета', text='Текст', author=self.auth_user
+        )
+        with mock.patch.object(search, 'RECENT_WINDOW', 1):
+            results = self.search('комета')
+        self.assertEqual([result['slug'] for result in results], [own.slug])
+
+    def test_search_prefix(self):
+        """Последнее слово ищется как префикс, пока его печатают."""
+        self.assertEqual(len(self.search('Заго')), 1)
+        self.assertEqual(len(self.search('Заголов')), 1)
+        self.assertEqual(len(self.search('Заго ')), 0)
+        self.assertEqual(len(self.search('"Заголовок OR')), 0)
+
+    def test_search_follows_update_and_delete(self):
+        """Индекс обновляется при редактировании и удалении заметки."""
+        self.author_client.post(self.URL_EDIT, data={
+            'title': 'Переименовано', 'text': 'Текст', 'slug': self.note.slug
+        })
+        self.assertEqual(self.search('Заголовок'), [])
+        self.assertEqual(len(self.search('Переименовано')), 1)
+        self.author_client.post(self.URL_DELETE)
+        self.assertEqual(self.search('Переименовано'), [])
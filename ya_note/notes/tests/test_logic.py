@@ -1,9 +1,24 @@
+import json
+import subprocess
+import sys
 from http import HTTPStatus
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+from zipfile import ZipFile
 
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from pytils.translit import slugify
 
+from notes import slugs
 from notes.forms import WARNING
 from notes.models import Note
+from notes.profiling import make_token
 from .base_tests import BaseTestCase
 
 
@@ -69,6 +84,82 @@ class TestNoteLogic(BaseTestCase):
         expected_slug = slugify(form_data['title'])
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_auto_slug_gets_free_suffix(self):
+        """Совпавший автоматический slug получает свободный суффикс."""
+        Note.objects.all().delete()
+        form_data = self.form_data.copy()
+        del form_data['slug']
+        for _ in range(3):
+            self.author_client.post(self.URL_ADD, data=form_data)
+        base = slugify(form_data['title'])
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {base, f'{base}-2', f'{base}-3'}
+        )
+
+    def test_auto_slug_follows_highest_suffix(self):
+        """
+        Суффикс берётся за наибольшим занятым, а slug, которые только
+        начинаются так же, не мешают.
+        """
+        for slug in ('zagolovok', 'zagolovok-7', 'zagolovok-07',
+                     'zagolovok-8x', 'zagolovok-9-2', 'zagolovok-draft'):
+            Note.objects.create(title='Заголовок', text='Текст',
+                                author=self.author, slug=slug)
+        note = Note.objects.create(title='Заголовок', text='Текст',
+                                   author=self.author)
+        self.assertEqual(note.slug, 'zagolovok-8')
+
+    def test_long_auto_slug_fits_suffix(self):
+        """У длинного заголовка суффикс вытесняет конец slug."""
+        title = 'а' * 100
+        first, second, third = (
+            Note.objects.create(title=title, text='Текст',
+                                author=self.author)
+            for _ in range(3)
+        )
+        base = slugs.base_slug(title)
+        self.assertEqual(
+            [first.slug, second.slug, third.slug],
+            [base, base[:98] + '-2', base[:98] + '-3'],
+        )
+        self.assertEqual(slugs.BatchSlugs(Note, [base]).allocate(base),
+                         base[:98] + '-4')
+
+    def test_auto_slug_single_lookup(self):
+        """Подбор slug делает один запрос на чтение."""
+        with CaptureQueriesContext(connection) as context:
+            Note.objects.create(title='Заголовок', text='Текст',
+                                author=self.author)
+        selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(Note.objects.latest('id').slug, 'zagolovok')
+
+    def test_auto_slug_retries_after_race(self):
+        """
+        Если slug заняли между подбором и вставкой, подбирается
+        следующий свободный.
+        """
+        Note.objects.create(title='Заголовок', text='Текст',
+                            author=self.author, slug='zagolovok')
+        real_numbers = slugs.numbers
+        calls = []
+
+        def stale_then_real(queryset, base):
+            calls.append(base)
+            if len(calls) == 1:
+                return False, 0
+            return real_numbers(queryset, base)
+
+        with mock.patch.object(slugs, 'numbers', stale_then_real):
+            Note.objects.create(title='Заголовок', text='Текст',
+                                author=self.author)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(Note.objects.filter(slug='zagolovok-2').exists())
+
     def test_author_can_edit_note(self):
         """Автор может редактировать свои заметки"""
         response = self.author_client.post(self.URL_EDIT,
@@ -107,3 +198,316 @@ class TestNoteLogic(BaseTestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertEqual(Note.objects.count(), initial_count)
         self.assertTrue(Note.objects.filter(id=self.note.id).exists())
+
+
+class TestImportExport(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'notes.ndjson'
+
+    def import_notes(self, rows, **options):
+        self.path.write_text(
+            '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows),
+            encoding='utf-8',
+        )
+        call_command(
+            'import_notes', str(self.path), stdout=StringIO(), **options
+        )
+
+    def test_import_resolves_slug_collisions(self):
+        """
+        Совпадающие slug в пачке и в БД получают суффиксы, заметка
+        с занятым явным slug пропускается.
+        """
+        Note.objects.create(title='План', text='Текст', author=self.author)
+        rows = [
+            {'title': 'План', 'text': 'Текст', 'author': 'author'},
+            {'title': 'План', 'text': 'Текст', 'author': 'author'},
+            {'title': 'Другое', 'text': 'Текст', 'slug': self.note.slug,
+             'author': 'author'},
+            {'title': 'Чужое', 'text': 'Текст', 'author': 'нет такого'},
+            {'title': 'Без текста', 'author': 'author'},
+        ]
+        selects = []
+
+        def record_select(execute, sql, params, many, context):
+            if sql.startswith('SELECT'):
+                selects.append(sql)
+            return execute(sql, params, many, context)
+
+        # CaptureQueriesContext не подходит: команда чистит журнал запросов.
+        with connection.execute_wrapper(record_select):
+            self.import_notes(rows, batch_size=10)
+        # Авторы и занятые slug — по запросу на пачку.
+        self.assertEqual(len(selects), 2)
+        self.assertEqual(
+            sorted(Note.objects.filter(title='План').values_list(
+                'slug', flat=True
+            )),
+            ['plan', 'plan-2', 'plan-3']
+        )
+        self.assertEqual(Note.objects.count(), 4)
+
+    def test_export_round_trip(self):
+        """Выгрузка читается импортом без потерь."""
+        out = StringIO()
+        call_command('export_notes', stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows, [{
+            'title': self.note.title,
+            'text': self.note.text,
+            'slug': self.note.slug,
+            'author': self.author.username,
+        }])
+        Note.objects.all().delete()
+        self.import_notes(rows)
+        note = Note.objects.get()
+        self.assertEqual(
+            (note.title, note.text, note.slug, note.author),
+            (self.note.title, self.note.text, self.note.slug, self.author)
+        )
+
+
+class TestExportView(BaseTestCase):
+
+    def export(self, file_format):
+        response = self.author_client.get(
+            self.URL_EXPORT, {'format': file_format}
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_export_ndjson(self):
+        """Выгрузка содержит только заметки пользователя."""
+        Note.objects.create(
+            title='Чужая', text='Текст', author=self.auth_user
+        )
+        rows = [
+            json.loads(line) for line in self.export('ndjson').splitlines()
+        ]
+        self.assertEqual(rows, [{
+            'title': self.note.title,
+            'text': self.note.text,
+            'slug': self.note.slug,
+        }])
+
+    def test_export_zip(self):
+        """Архив читается и содержит по файлу Markdown на заметку."""
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {number}', text='Текст ' * number,
+                 slug=f'zip-{number}', author=self.author)
+            for number in range(50)
+        )
+        with ZipFile(BytesIO(self.export('zip'))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(len(archive.namelist()), 51)
+            self.assertEqual(
+                archive.read(f'{self.note.slug}.md').decode(),
+                f'# {self.note.title}\n\n{self.note.text}\n',
+            )
+
+    def test_export_unknown_format(self):
+        """Неизвестный формат выгрузки — 404."""
+        response = self.author_client.get(self.URL_EXPORT, {'format': 'pdf'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestNotesApi(BaseTestCase):
+
+    def post(self, operations, **headers):
+        return self.author_client.post(
+            self.URL_API, {'operations': operations},
+            content_type='application/json', **headers
+        )
+
+    def test_batch_applied_in_fixed_number_of_queries(self):
+        """
+        Пачка создаёт, изменяет и удаляет заметки; число запросов
+        не зависит от её размера.
+        """
+        doomed = Note.objects.create(
+            title='Удалить', text='Текст', author=self.author
+        )
+        operations = [
+            {'action': 'update', 'id': self.note.pk, 'title': 'Новый',
+             'text': 'Новый текст', 'slug': self.note.slug},
+            {'action': 'delete', 'id': doomed.pk},
+            # Slug удаляемой заметки освобождается в той же пачке.
+            {'action': 'create', 'title': 'Занятый', 'text': 'Текст',
+             'slug': doomed.slug},
+        ] + [
+            {'action': 'create', 'title': 'План', 'text': 'Текст'}
+            for _ in range(20)
+        ]
+        # Сессия и пользователь попадают в кеш на первом запросе.
+        self.author_client.get(self.URL_API)
+        with CaptureQueriesContext(connection) as context:
+            response = self.post(operations)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertLessEqual(len(context.captured_queries), 11)
+        results = response.json()['results']
+        self.assertEqual(results[2]['slug'], doomed.slug)
+        self.assertEqual(
+            [result['slug'] for result in results[3:6]],
+            ['plan', 'plan-2', 'plan-3'],
+        )
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, 'Новый')
+        self.assertEqual(
+            Note.objects.get(pk=results[3]['id']).slug, 'plan'
+        )
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 22)
+        self.assertEqual(response['ETag'], self.author_client.get(
+            self.URL_API
+        )['ETag'])
+
+    def test_invalid_batch_changes_nothing(self):
+        """Ошибка в одной операции отменяет всю пачку."""
+        other = Note.objects.create(
+            title='Чужая', text='Текст', author=self.auth_user
+        )
+        operations = [
+            {'action': 'create', 'title': 'Хорошая', 'text': 'Текст'},
+            {'action': 'create', 'title': 'Без текста'},
+            {'action': 'create', 'title': 'Занятый', 'text': 'Текст',
+             'slug': self.note.slug},
+            {'action': 'delete', 'id': other.pk},
+            {'action': 'move'},
+        ]
+        response = self.post(operations)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            [error['index'] for error in response.json()['errors']],
+            [1, 2, 3, 4],
+        )
+        self.assertEqual(Note.objects.count(), 2)
+        too_many = [{'action': 'delete', 'id': 0}] * 501
+        self.assertEqual(
+            self.post(too_many).status_code, HTTPStatus.BAD_REQUEST
+        )
+
+    def test_conditional_fetch_and_update(self):
+        """
+        Неизменившиеся заметки не загружаются повторно, а пачка
+        с устаревшим ETag отклоняется.
+        """
+        response = self.author_client.get(self.URL_API)
+        etag = response['ETag']
+        self.assertEqual(
+            [note['slug'] for note in response.json()['notes']],
+            [self.note.slug],
+        )
+        response = self.author_client.get(
+            self.URL_API, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.author_client.post(self.URL_EDIT, data={
+            'title': 'Изменено', 'text': 'Текст', 'slug': self.note.slug
+        })
+        response = self.post(
+            [{'action': 'delete', 'id': self.note.pk}], HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PRECONDITION_FAILED)
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+
+    def test_etag_changes_on_any_change(self):
+        """Удаление и массовые операции тоже меняют ETag."""
+        etags = [self.author_client.get(self.URL_API)['ETag']]
+        Note.objects.bulk_create([
+            Note(title='Пачка', text='Текст', slug='batch', author=self.author)
+        ])
+        etags.append(self.author_client.get(self.URL_API)['ETag'])
+        Note.objects.filter(slug='batch').delete()
+        etags.append(self.author_client.get(self.URL_API)['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+        other_etag = self.auth_user_client.get(self.URL_API)['ETag']
+        Note.objects.filter(pk=self.note.pk).update(title='Тихо')
+        self.assertNotEqual(
+            self.author_client.get(self.URL_API)['ETag'], etags[-1]
+        )
+        self.assertEqual(
+            self.auth_user_client.get(self.URL_API)['ETag'], other_etag
+        )
+
+    def test_api_requires_login(self):
+        """Без авторизации API отвечает 403."""
+        response = self.client.get(self.URL_API)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class TestProfiling(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        profiling = override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.path
+        )
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+
+    def saved(self):
+        return [
+            json.loads(path.read_text())
+            for path in sorted(self.path.glob('*.json'))
+        ]
+
+    def test_signed_header_profiles_request(self):
+        """
+        Запрос с подписанным заголовком сохраняет профиль с SQL
+        и временем шаблонов, без заголовка — нет.
+        """
+        self.author_client.get(self.URL_LIST)
+        self.author_client.get(self.URL_LIST, HTTP_X_PROFILE='profile')
+        self.assertEqual(self.saved(), [])
+        self.author_client.get(self.URL_LIST, HTTP_X_PROFILE=make_token())
+        (meta,) = self.saved()
+        self.assertEqual(meta['url_name'], 'notes:list')
+        self.assertTrue(meta['queries'])
+        self.assertGreater(meta['template_time'], 0)
+        self.assertEqual(len(list(self.path.glob('*.prof'))), 1)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_FILES=2)
+    def test_sampled_profiles_rotate_and_report(self):
+        """
+        Выборка профилирует запросы без заголовка, хранятся последние
+        профили, сводка группирует их по имени URL.
+        """
+        for url in (self.URL_LIST, self.URL_DETAIL, self.URL_DETAIL):
+            self.author_client.get(url)
+        self.assertEqual(
+            [meta['url_name'] for meta in self.saved()],
+            ['notes:detail', 'notes:detail'],
+        )
+        out = StringIO()
+        call_command('profile_report', top=3, stdout=out)
+        self.assertIn('notes:detail: профилей 2', out.getvalue())
+        self.assertIn('SELECT', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Блокировки SQLite.')
+class TestConcurrentWrites(SimpleTestCase):
+    def test_concurrent_note_creation(self):
+        """
+        Параллельные добавления заметок с одинаковым заголовком
+        проходят без «database is locked» и конфликтов slug.
+
+        Тестовая БД в памяти блокируется иначе, чем файл, поэтому
+        нагрузку даёт команда loadtest в отдельном процессе со своей
+        временной БД.
+        """
+        output = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'),
+             'loadtest', '--mix', 'write=100', '--workers', '4',
+             '--notes', '10', '--requests', '200'],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        route, requests, _, errors, locks = output.splitlines()[-1].split()[:5]
+        self.assertEqual(
+            (route, requests, errors, locks), ('всего', '200', '0', '0'),
+            output,
+        )
@@ -14,6 +14,8 @@ class TestRoutes(BaseTestCase):
             (self.URL_LOGOUT, self.client, HTTPStatus.OK),
 
             (self.URL_LIST, self.author_client, HTTPStatus.OK),
+            (self.URL_SEARCH, self.author_client, HTTPStatus.OK),
+            (self.URL_EXPORT, self.author_client, HTTPStatus.OK),
             (self.URL_SUCCESS, self.author_client, HTTPStatus.OK),
             (self.URL_ADD, self.author_client, HTTPStatus.OK),
             (self.URL_DETAIL, self.author_client, HTTPStatus.OK),
@@ -37,6 +39,8 @@ class TestRoutes(BaseTestCase):
         """
         urls = (
             self.URL_LIST,
+            self.URL_SEARCH,
+            self.URL_EXPORT,
             self.URL_SUCCESS,
             self.URL_ADD,
             self.URL_DETAIL,
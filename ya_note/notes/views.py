@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
+from . import api, export, search
 from .forms import NoteForm
 from .models import Note
 
@@ -53,6 +58,94 @@ class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """
+        Страница заметок по возрастанию id, начиная после ``after``.
+
+        Индекс (author, id) сразу приводит к началу страницы, поэтому
+        глубина листания не влияет на стоимость запроса.
+        """
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        after = self.request.GET.get('after')
+        if after:
+            try:
+                queryset = queryset.filter(id__gt=int(after))
+            except ValueError:
+                raise Http404('Некорректный параметр after')
+        return queryset[:settings.NOTES_PER_PAGE]
+
+    def get_context_data(self, **kwargs):
+        """Ссылку дальше показываем, если страница заполнена целиком."""
+        context = super().get_context_data(**kwargs)
+        page = list(self.object_list)
+        if len(page) == settings.NOTES_PER_PAGE:
+            context['next_after'] = page[-1].id
+        return context
+
+
+class NoteSearch(LoginRequiredMixin, generic.TemplateView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '')
+        context.update(
+            query=query.strip(),
+            results=search.search(query, self.request.user.pk),
+        )
+        return context
+
+
+class NoteExport(LoginRequiredMixin, generic.View):
+    """Выгрузка всех заметок пользователя в NDJSON или zip-архиве."""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            stream, content_type, filename = export.FORMATS[
+                request.GET.get('format', 'ndjson')
+            ]
+        except KeyError:
+            raise Http404('Неизвестный формат выгрузки')
+        response = StreamingHttpResponse(
+            stream(request.user), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
+
+class NotesApi(LoginRequiredMixin, generic.View):
+    """
+    JSON API: страница заметок пользователя и пакетные изменения.
+
+    Без авторизации отвечаем 403, а не перенаправлением на вход.
+    """
+    raise_exception = True
+
+    @method_decorator(condition(etag_func=api.notes_etag))
+    def get(self, request, *args, **kwargs):
+        after = request.GET.get('after')
+        try:
+            after = int(after) if after else None
+        except ValueError:
+            raise Http404('Некорректный параметр after')
+        return JsonResponse(api.notes_page(request.user, after))
+
+    @method_decorator(condition(etag_func=api.notes_etag))
+    def post(self, request, *args, **kwargs):
+        try:
+            operations = api.parse_operations(request.body)
+            results = api.apply(api.validate(request.user, operations))
+        except api.BatchError as error:
+            return JsonResponse(error.payload, status=error.status)
+        response = JsonResponse({'results': results})
+        response['ETag'] = f'"{api.notes_etag(request)}"'
+        return response
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,10 +57,30 @@ WSGI_APPLICATION = 'yanote.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('YANOTE_DB', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Кеш в памяти процесса. Если процессов несколько, нужен общий кеш,
+# например 'django.core.cache.backends.filebased.FileBasedCache'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Сессии читаются из кеша и дублируются в БД, поэтому переживают его
+# сброс. Другой движок задаётся через YANOTE_SESSION_ENGINE.
+SESSION_ENGINE = os.getenv(
+    'YANOTE_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'
+)
+
+# Пользователь берётся из кеша, а не из БД, на каждом запросе. При
+# нескольких процессах кеш должен быть общим, иначе смена пароля
+# дойдёт до остальных процессов только через USER_CACHE_TIMEOUT.
+AUTHENTICATION_BACKENDS = ['notes.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60 * 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +109,28 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_PER_PAGE = 100
+
+# Поиск ранжирует столько последних совпадений и выводит лучшие.
+NOTES_SEARCH_CANDIDATES = 200
+NOTES_SEARCH_LIMIT = 20
+
+# Выгрузка читает заметки из БД пачками такого размера.
+NOTES_EXPORT_CHUNK_SIZE = 2000
+
+# JSON API: размер страницы заметок и наибольшая пачка операций.
+NOTES_API_PAGE_SIZE = 500
+NOTES_BATCH_LIMIT = 500
+
+# Профилирование запросов (notes.profiling). Когда оно включено,
+# профилируются запросы с заголовком PROFILING_HEADER, значение которого
+# печатает ``profile_report --token``, и доля PROFILING_SAMPLE_RATE
+# остальных. Хранятся последние PROFILING_MAX_FILES профилей.
+PROFILING_ENABLED = os.getenv('YANOTE_PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.getenv('YANOTE_PROFILING_SAMPLE_RATE', 0))
+PROFILING_HEADER = 'X-Profile'
+# Сколько секунд действительно значение заголовка.
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_DIR = Path(os.getenv('YANOTE_PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = 1000